@@ -0,0 +1,59 @@
+#!/usr/bin/python3
+import sys
+import time
+import random
+from search import intersect, linear_intersect, gallop_intersect, hash_intersect
+
+# lengths of the longer postings list, and of the shorter one relative to it
+LENGTHS = [16, 64, 1024, 100000]
+RATIOS = [1, 2, 4, 8, 16, 32, 64, 128, 1024]
+NUM_RUNS = 5
+METHODS = [linear_intersect, gallop_intersect, hash_intersect]
+
+
+def time_method(method, a, b):
+    '''
+    time the fastest of NUM_RUNS runs of an intersection method
+    :param method: intersection method
+    :param a: short postings list
+    :param b: long postings list
+    :return: time in seconds
+    '''
+    best = None
+    for _ in range(NUM_RUNS):
+        start = time.perf_counter()
+        method(a, b)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def run_benchmark(lengths):
+    '''
+    print the time of every intersection method on random postings lists,
+    and which method is the fastest, to find the crossover points that
+    GALLOP_RATIO and LINEAR_MAX_LEN in search.py are based on
+    :param lengths: lengths of the longer postings list
+    '''
+    print("{:>8} {:>6} {:>18} {:>18} {:>18}  {}".format("long", "ratio", \
+        *[method.__name__ for method in METHODS], "fastest"))
+    for long_len in lengths:
+        for ratio in RATIOS:
+            short_len = max(long_len // ratio, 1)
+            b = sorted(random.sample(range(4 * long_len), long_len))
+            a = sorted(random.sample(range(4 * long_len), short_len))
+
+            expected = intersect(a, b)
+            times = []
+            for method in METHODS:
+                assert method(a, b) == expected
+                times.append(time_method(method, a, b))
+
+            fastest = METHODS[times.index(min(times))]
+            print("{:>8} {:>6} {:>16.3f}ms {:>16.3f}ms {:>16.3f}ms  {}".format(long_len, ratio, \
+                *[t * 1000 for t in times], fastest.__name__))
+
+
+if __name__ == "__main__":
+    run_benchmark([int(length) for length in sys.argv[1:]] or LENGTHS)
@@ -4,13 +4,22 @@ import nltk
 import sys
 import getopt
 import os
-import math
+import bisect
 from nltk.stem.porter import PorterStemmer
 from nltk.tokenize import *
 
 operator = ["AND", "OR", "NOT"]
 bracket = ["(", ")"]
 priority = {'NOT': 3, 'AND': 2, 'OR': 1, '(': 0, ')':0}
+# an AND of two postings lists uses galloping search when one list is at least
+# GALLOP_RATIO times longer, and a linear merge when both lists have at most
+# LINEAR_MAX_LEN docIDs (see benchmark_merge.py). Galloping beats the hash set
+# at every length from a ratio of 64 on; at 32 the two are within noise of each
+# other and either can win from run to run, so the threshold is not set lower
+# than 64. The hash set of plain docIDs is already faster than a linear merge
+# at 16 docIDs, so only lists of up to 4 docIDs are merged linearly
+GALLOP_RATIO = 64
+LINEAR_MAX_LEN = 4
 
 
 class dictionary(object):
@@ -116,44 +125,9 @@ def merge(a, b, op):
     :param op: operator, type=str
     :return: merged result
     """
-    # we apply evenly distributed skip pointers to all posting lists
-    # (including the intermediate generated ones)
-    jump_a = math.floor(math.sqrt(len(a)))
-    jump_b = math.floor(math.sqrt(len(b)))
-
     result = []
     if op == "AND":
-        i, j = 0, 0
-        while i < len(a) and j < len(b):
-            if a[i] < b[j]:
-                if i % jump_a == 0 and i + jump_a < len(a) and jump_a != 1:
-                    if a[i + jump_a] < b[j]:
-                        i += jump_a
-                    elif a[i + jump_a] == b[j]:
-                        result.append(b[j])
-                        i += jump_a + 1
-                        j += 1
-                    else:
-                        i += 1
-                else:
-                    i += 1
-            elif a[i] > b[j]:
-                if j % jump_b == 0 and j + jump_b < len(b) and jump_b != 1:
-                    if b[j + jump_b] < a[i]:
-                        j += jump_b
-                    elif b[j + jump_b] == a[i]:
-                        result.append(a[i])
-                        i += 1
-                        j += jump_b + 1
-                    else:
-                        j += 1
-                else:
-                    j += 1
-            else:
-                result.append(a[i])
-                i += 1
-                j += 1
-        return result
+        return intersect(a, b)
 
     elif op == "OR":
         i, j = 0, 0
@@ -182,6 +156,90 @@ def merge(a, b, op):
         return []
 
 
+def intersect(a, b):
+    """
+    intersect two postings lists, choosing the method by their lengths:
+    galloping search if one list is at least GALLOP_RATIO times longer,
+    a linear merge if both lists have at most LINEAR_MAX_LEN docIDs,
+    and a hash probe otherwise (see benchmark_merge.py)
+    :param a: postings list 1
+    :param b: postings list 2
+    :return: intersected result
+    """
+    if len(a) > len(b):
+        a, b = b, a
+
+    if len(b) >= GALLOP_RATIO * len(a):
+        return gallop_intersect(a, b)
+    elif len(b) <= LINEAR_MAX_LEN:
+        return linear_intersect(a, b)
+    else:
+        return hash_intersect(a, b)
+
+
+def linear_intersect(a, b):
+    """
+    intersect two postings lists by walking through both of them
+    :param a: postings list 1
+    :param b: postings list 2
+    :return: intersected result
+    """
+    result = []
+    i, j = 0, 0
+    while i < len(a) and j < len(b):
+        if a[i] < b[j]:
+            i += 1
+        elif a[i] > b[j]:
+            j += 1
+        else:
+            result.append(a[i])
+            i += 1
+            j += 1
+    return result
+
+
+def gallop_intersect(a, b):
+    """
+    intersect a short postings list with a much longer one: for each docID
+    of the short list, the long list is probed at steps that double in size
+    from the last position, then the range the docID falls in is binary searched
+    :param a: short postings list
+    :param b: long postings list
+    :return: intersected result
+    """
+    result = []
+    lo = 0
+    for doc_id in a:
+        hi = lo
+        step = 1
+        while hi < len(b) and b[hi] < doc_id:
+            lo = hi + 1
+            hi = lo + step
+            step *= 2
+
+        j = bisect.bisect_left(b, doc_id, lo, min(hi, len(b)))
+        if j == len(b):
+            break
+        if b[j] == doc_id:
+            result.append(doc_id)
+            lo = j + 1
+        else:
+            lo = j
+    return result
+
+
+def hash_intersect(a, b):
+    """
+    intersect two postings lists by scanning the longer one once and
+    looking up each of its docIDs in a hash set of the shorter one
+    :param a: short postings list
+    :param b: long postings list
+    :return: intersected result
+    """
+    probe = set(a)
+    return [doc_id for doc_id in b if doc_id in probe]
+
+
 def reverse_postings(postings):
     '''
     operator is "NOT", so the new postings list should be {ALL - postings}
@@ -320,28 +378,29 @@ def usage():
     print("usage: " + sys.argv[0] + " -d dictionary-file -p postings-file -q file-of-queries -o output-file-of-results")
 
 
-dictionary_file = postings_file = file_of_queries = output_file_of_results = None
-
-try:
-    opts, args = getopt.getopt(sys.argv[1:], 'd:p:q:o:')
-except getopt.GetoptError:
-    usage()
-    sys.exit(2)
-
-for o, a in opts:
-    if o == '-d':
-        dictionary_file = a
-    elif o == '-p':
-        postings_file = a
-    elif o == '-q':
-        file_of_queries = a
-    elif o == '-o':
-        file_of_output = a
-    else:
-        assert False, "unhandled option"
+if __name__ == "__main__":
+    dictionary_file = postings_file = file_of_queries = output_file_of_results = None
+
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'd:p:q:o:')
+    except getopt.GetoptError:
+        usage()
+        sys.exit(2)
+
+    for o, a in opts:
+        if o == '-d':
+            dictionary_file = a
+        elif o == '-p':
+            postings_file = a
+        elif o == '-q':
+            file_of_queries = a
+        elif o == '-o':
+            file_of_output = a
+        else:
+            assert False, "unhandled option"
 
-if dictionary_file == None or postings_file == None or file_of_queries == None or file_of_output == None:
-    usage()
-    sys.exit(2)
+    if dictionary_file == None or postings_file == None or file_of_queries == None or file_of_output == None:
+        usage()
+        sys.exit(2)
 
-run_search(dictionary_file, postings_file, file_of_queries, file_of_output)
+    run_search(dictionary_file, postings_file, file_of_queries, file_of_output)
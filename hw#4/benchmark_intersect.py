@@ -0,0 +1,100 @@
+#!/usr/bin/python3
+import sys
+import time
+import getopt
+import random
+
+from query_util import DocIds, find_matches, get_doc_info, get_match_method, \
+    linear_match, gallop_match, hash_match
+
+"""
+Lengths of the shorter posting list relative to the longer one, as ratios.
+"""
+RATIOS = [1, 2, 4, 8, 16, 32, 64, 128, 1024]
+
+"""
+Lengths of the longer posting list that are benchmarked by default.
+"""
+LENGTHS = [16, 64, 1024, 100000]
+
+"""
+Number of times each intersection is run. The fastest run is reported.
+"""
+NUM_RUNS = 5
+
+METHODS = [linear_match, gallop_match, hash_match]
+
+def usage():
+    print("usage: " + sys.argv[0] + " [-n length-of-longer-list ...] [-r num-runs]")
+    print("  times every intersection method (see query_util.get_match_method) on random posting lists")
+
+def get_posting_list(length, max_doc_id):
+    """
+    Returns a posting list of `length` random docIDs up to `max_doc_id`.
+    """
+    doc_ids = sorted(random.sample(range(1, max_doc_id + 1), length))
+    return [get_doc_info("term", doc_id, 1, [0]) for doc_id in doc_ids]
+
+def time_match(match, doc_ids1, doc_ids2, num_runs):
+    """
+    Returns the time (in seconds) of the fastest of `num_runs` runs of
+    `match` on the two lists of docIDs.
+    """
+    best_time = None
+    for _ in range(num_runs):
+        start_time = time.perf_counter()
+        match(doc_ids1, doc_ids2)
+        run_time = time.perf_counter() - start_time
+        if best_time is None or run_time < best_time:
+            best_time = run_time
+    return best_time
+
+def run_benchmark(lengths=LENGTHS, num_runs=NUM_RUNS):
+    """
+    Prints the time of every intersection method for posting lists of the
+    given lengths at every ratio in `RATIOS`, and whether the method that is
+    chosen by `get_match_method` is the fastest one.
+    """
+    print("{:>8} {:>6} {:>12} {:>12} {:>12}  {:<14} {}".format("long", "ratio", \
+        *[match.__name__ for match in METHODS], "fastest", "chosen"))
+
+    for long_len in lengths:
+        for ratio in RATIOS:
+            short_len = max(long_len // ratio, 1)
+            long_list = get_posting_list(long_len, 4 * long_len)
+            short_list = get_posting_list(short_len, 4 * long_len)
+            (short_doc_ids, long_doc_ids) = (DocIds(short_list), DocIds(long_list))
+
+            expected = find_matches(short_doc_ids, long_doc_ids)
+            times = []
+            for match in METHODS:
+                assert match(short_doc_ids, long_doc_ids) == expected
+                times.append(time_match(match, short_doc_ids, long_doc_ids, num_runs))
+
+            fastest = METHODS[times.index(min(times))]
+            chosen = get_match_method(short_len, long_len)
+            print("{:>8} {:>6} {:>10.3f}ms {:>10.3f}ms {:>10.3f}ms  {:<14} {}".format( \
+                long_len, ratio, *[t * 1000 for t in times], fastest.__name__, \
+                chosen.__name__ + ("" if chosen is fastest else " *")))
+
+    print("* the chosen method is not the fastest one")
+
+if __name__ == "__main__":
+    lengths = []
+    num_runs = NUM_RUNS
+
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'n:r:')
+    except getopt.GetoptError:
+        usage()
+        sys.exit(2)
+
+    for o, a in opts:
+        if o == '-n':
+            lengths.append(int(a))
+        elif o == '-r':
+            num_runs = int(a)
+        else:
+            assert False, "unhandled option"
+
+    run_benchmark(lengths or LENGTHS, num_runs)
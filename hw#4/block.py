@@ -7,12 +7,17 @@ from dictionary_entry import DictionaryEntry
 class Block:
     """
     Represents a block. It has a capacity of `MAX_TOKENS`.
+
+    The dictionaries saved by a block are named `<shard_id>_<dictionary_id>`,
+    so that blocks created by different shards of the documents (see
+    `create_blocks`) never overwrite one another.
     """
     MAX_TOKENS = 10000000
 
-    def __init__(self):
+    def __init__(self, shard_id=0):
         self.dictionary = {}
         self.tokens_count = 0
+        self.shard_id = shard_id
         self.curr_dictionary_id = 0
 
     def is_full(self):
@@ -83,7 +88,7 @@ class Block:
         Writes the dictionary and postings lists to disk.
         """
         dict_lists_dir_path = os.path.join(TEMP_DIR, TO_MERGE_DIR, \
-            str(self.curr_dictionary_id))
+            "{}_{}".format(self.shard_id, self.curr_dictionary_id))
 
         if not os.path.isdir(dict_lists_dir_path):
             os.mkdir(dict_lists_dir_path)
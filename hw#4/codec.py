@@ -0,0 +1,142 @@
+"""
+Integer codecs that are used to compress the sections of the postings file.
+
+Every encoder takes an iterable of non-negative integers and returns bytes.
+Every decoder is a generator that takes a bytes-like object and yields the
+integers one at a time, so that a section can be decoded while it is being
+read.
+"""
+CODEC_FIXED = 0
+CODEC_VB = 1
+CODEC_GAMMA = 2
+CODEC_DELTA = 3
+
+def vb_encode_number(number):
+    """
+    Encodes a number with variable byte encoding. The continuation bit
+    is set on the last byte of the number.
+    """
+    encoded = bytearray()
+    while True:
+        encoded.insert(0, number % 128)
+        if number < 128:
+            break
+        number //= 128
+    encoded[-1] += 128
+    return encoded
+
+def vb_encode(numbers):
+    """
+    Encodes the numbers with variable byte encoding.
+    """
+    encoded = bytearray()
+    for number in numbers:
+        encoded += vb_encode_number(number)
+    return bytes(encoded)
+
+def vb_decode(data):
+    """
+    Decodes numbers that are encoded with variable byte encoding.
+    """
+    number = 0
+    for byte in data:
+        if byte < 128:
+            number = 128 * number + byte
+        else:
+            yield 128 * number + byte - 128
+            number = 0
+
+def gamma_encode(numbers):
+    """
+    Encodes the numbers with Elias gamma encoding. Since gamma codes
+    only exist for positive numbers, `number + 1` is encoded instead.
+    """
+    bits = []
+    for number in numbers:
+        bits.append(to_gamma_bits(number + 1))
+    return to_bytes("".join(bits))
+
+def gamma_decode(data):
+    """
+    Decodes numbers that are encoded with Elias gamma encoding.
+    """
+    bits = to_bits(data)
+    i = 0
+    while True:
+        (number, i) = read_gamma_bits(bits, i)
+        if number is None:
+            return
+        yield number - 1
+
+def delta_encode(numbers):
+    """
+    Encodes the numbers with Elias delta encoding. Since delta codes
+    only exist for positive numbers, `number + 1` is encoded instead.
+    """
+    bits = []
+    for number in numbers:
+        binary = bin(number + 1)[2:]
+        bits.append(to_gamma_bits(len(binary)))
+        bits.append(binary[1:])
+    return to_bytes("".join(bits))
+
+def delta_decode(data):
+    """
+    Decodes numbers that are encoded with Elias delta encoding.
+    """
+    bits = to_bits(data)
+    i = 0
+    while True:
+        (length, i) = read_gamma_bits(bits, i)
+        if length is None:
+            return
+        yield int("1" + bits[i:i + length - 1], 2) - 1
+        i += length - 1
+
+def to_gamma_bits(number):
+    """
+    Returns the gamma code of a positive number as a string of bits.
+    """
+    binary = bin(number)[2:]
+    return "0" * (len(binary) - 1) + binary
+
+def read_gamma_bits(bits, i):
+    """
+    Reads the gamma code that starts at index `i` of `bits`.
+
+    Returns the decoded number and the index right after the code. The
+    number is `None` if only padding is left.
+    """
+    end = bits.find("1", i)
+    if end == -1:
+        return (None, i)
+    length = end - i + 1
+    return (int(bits[end:end + length], 2), end + length)
+
+def to_bytes(bits):
+    """
+    Converts a string of bits to bytes. The bits are padded with zeros
+    at the end to fill up the last byte.
+    """
+    num_bytes = (len(bits) + 7) // 8
+    if num_bytes == 0:
+        return b""
+    bits += "0" * (num_bytes * 8 - len(bits))
+    return int(bits, 2).to_bytes(num_bytes, 'big')
+
+def to_bits(data):
+    """
+    Converts bytes to a string of bits.
+    """
+    if len(data) == 0:
+        return ""
+    return bin(int.from_bytes(data, 'big'))[2:].zfill(len(data) * 8)
+
+"""
+Encoder and decoder of each codec.
+"""
+CODECS = {
+    CODEC_VB: (vb_encode, vb_decode),
+    CODEC_GAMMA: (gamma_encode, gamma_decode),
+    CODEC_DELTA: (delta_encode, delta_decode)
+}
@@ -1,11 +1,25 @@
 import os
+import pickle
+from collections import deque
+from itertools import islice
 from math import sqrt
+from concurrent.futures import ProcessPoolExecutor
 
 from block import Block
-from tokenizer import tokenize_document
-from query_util import calculate_weighted_tf
+from temp_dir_util import TEMP_DIR, DOC_VECTORS_DIR
+from tokenizer import tokenize_document, tokenize_biwords, stem_cache
+from query_util import calculate_weighted_tf, calculate_idf
+from relevance_feedback import FEEDBACK_TERMS
 
-def create_blocks_and_find_lengths(doc_list):
+"""
+Number of documents in each shard that is tokenized by a worker process,
+and the number of shards (per worker) that may be read ahead. Once that
+many shards are pending, reading waits until the oldest shard is done.
+"""
+DOCS_PER_SHARD = 1000
+MAX_PENDING_SHARDS_PER_WORKER = 2
+
+def create_blocks_and_find_lengths(docs, num_workers=1, use_biwords=False):
     """
     Creates the initial blocks, finds the length and court importance
     of each document.
@@ -13,34 +27,150 @@ def create_blocks_and_find_lengths(doc_list):
     Specifically, each of the files are then read and processed. 
     Moreover, doc ids, length information and court importance are 
     computed here.
+
+    `docs` can be any iterable (e.g. a generator) of documents, which is
+    consumed as the blocks are created.
+
+    When `num_workers` is greater than 1, `docs` is read in contiguous shards
+    of `DOCS_PER_SHARD` documents, which are tokenized in parallel by a pool
+    of processes. Each process saves its own blocks (see
+    `create_blocks_in_worker`). At most `MAX_PENDING_SHARDS_PER_WORKER`
+    shards per worker are read ahead, so that memory stays bounded even if
+    reading is faster than tokenizing.
+
+    When `use_biwords` is set, the biwords of each document (see
+    `tokenize_biwords`) are added to the blocks as well.
     
     Returns a dictionary that maps each document ID to its length and
     court importance information. In particular, these values are stored
-    as a tuple `(length, court_importance)`.
+    as a tuple `(length, court_importance)`. The document vectors are
+    written to the temporary directory instead (see `read_doc_vectors`),
+    so that they are never all held in memory.
 
-    NOTE: We assumed that `doc_list` is sorted by non-decreasing document
+    All stems that are computed are tracked by `stem_cache`, so that the
+    full table of stems can be saved after indexing.
+
+    NOTE: We assumed that `docs` is sorted by non-decreasing document
     IDs.
     """
+    stem_cache.track_new_stems = True
+
+    if num_workers <= 1:
+        return create_blocks_for_shard(docs, use_biwords=use_biwords)
 
-    block = Block()
     lengths_and_court_importance = {}
+    pending_shards = deque()
+    max_pending_shards = MAX_PENDING_SHARDS_PER_WORKER * num_workers
+
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        for (shard_id, shard) in enumerate(read_shards(docs, DOCS_PER_SHARD)):
+            if len(pending_shards) >= max_pending_shards:
+                collect_shard(pending_shards.popleft(), lengths_and_court_importance)
 
-    for doc in doc_list:
-        doc_id = int(doc[0])
-        content = doc[1:]
-        (length, court_importance) = process_document(content, doc_id, block)
-        lengths_and_court_importance[doc_id] = (length, court_importance)
+            pending_shards.append(executor.submit(create_blocks_in_worker, \
+                shard, shard_id, use_biwords))
+
+        while pending_shards:
+            collect_shard(pending_shards.popleft(), lengths_and_court_importance)
+
+    return lengths_and_court_importance
+
+def create_blocks_in_worker(docs, shard_id, use_biwords=False):
+    """
+    Creates the blocks for a shard of documents in a worker process.
+
+    Returns the length and court importance of each document (see
+    `create_blocks_for_shard`), together with the stems that the worker
+    has computed since its previous shard.
+    """
+    stem_cache.track_new_stems = True
+    lengths_and_court_importance = create_blocks_for_shard(docs, shard_id, use_biwords)
+    return (lengths_and_court_importance, stem_cache.pop_new_stems())
+
+def collect_shard(future, lengths_and_court_importance):
+    """
+    Waits for the shard computed by `future`, and adds its results to
+    `lengths_and_court_importance` and to the stem cache of this process.
+
+    NOTE: Shards are collected in their order, i.e. by docID.
+    """
+    (shard_lengths, shard_stems) = future.result()
+    lengths_and_court_importance.update(shard_lengths)
+    stem_cache.update(shard_stems)
+
+def create_blocks_for_shard(docs, shard_id=0, use_biwords=False):
+    """
+    Creates the blocks for the documents in `docs`, which is one shard
+    of all documents, and finds the length and court importance of each
+    document. The vector of each document is written to the doc vectors
+    file of the shard, in order of docID.
+
+    Returns a dictionary that maps each document ID to its
+    `(length, court_importance)`.
+    """
+    block = Block(shard_id)
+    lengths_and_court_importance = {}
+
+    with open(get_doc_vectors_path(shard_id), 'wb') as f:
+        for doc in docs:
+            doc_id = int(doc[0])
+            content = doc[1:]
+            ((length, doc_vec), court_importance) = process_document(content, doc_id, \
+                block, use_biwords)
+            lengths_and_court_importance[doc_id] = (length, court_importance)
+            pickle.dump((doc_id, doc_vec), f)
 
     if not block.is_empty():
         block.save_dictionary()
 
     return lengths_and_court_importance
 
-def process_document(content, doc_id, block):
+def get_doc_vectors_path(shard_id):
+    """
+    Returns the path of the file that holds the document vectors of the
+    shard with `shard_id`.
+    """
+    return os.path.join(TEMP_DIR, DOC_VECTORS_DIR, str(shard_id))
+
+def read_doc_vectors():
+    """
+    Reads the document vectors written by `create_blocks_for_shard`.
+
+    Yields `(doc_id, [(term, weighted tf)])` for each document, in order of
+    docID. The vectors are read one after another, so only one of them is
+    kept in memory at any one time.
+    """
+    shard_ids = sorted(int(name) for name in os.listdir(os.path.join(TEMP_DIR, DOC_VECTORS_DIR)))
+
+    for shard_id in shard_ids:
+        with open(get_doc_vectors_path(shard_id), 'rb') as f:
+            while True:
+                try:
+                    yield pickle.load(f)
+                except EOFError:
+                    break
+
+def read_shards(docs, shard_size):
+    """
+    Reads `docs` in contiguous shards of at most `shard_size` documents.
+    """
+    docs = iter(docs)
+
+    while True:
+        shard = list(islice(docs, shard_size))
+        if not shard:
+            return
+        yield shard
+
+def process_document(content, doc_id, block, use_biwords=False):
     """
     Processes the content by tokenizing it and computes its length. 
-    Then, update the given block and return the length and the court's
+    Then, update the given block and return the length (with the
+    document vector, see `compute_doc_vector`) and the court's
     importance of this document.
+
+    When `use_biwords` is set, the biwords of the document are added to
+    the block too. They are not part of the document vector.
     """
     COURT_INDEX = 3
     tokens = tokenize_document(content, doc_id)
@@ -48,6 +178,9 @@ def process_document(content, doc_id, block):
     length = compute_doc_vector(tokens)
     update_block(block, tokens)
 
+    if use_biwords:
+        update_block(block, tokenize_biwords(tokens, doc_id))
+
     return (length, court_importance)
     
 def compute_doc_vector(tokens):
@@ -69,6 +202,26 @@ def compute_doc_vector(tokens):
 
     return (sqrt(length), doc_vec)
 
+def compute_feedback_vectors(dictionary, num_of_docs, num_terms=FEEDBACK_TERMS):
+    """
+    Computes the top `num_terms` terms of each document by tf-idf, which
+    can only be done once the document frequencies in `dictionary` are
+    known.
+
+    The document vectors are streamed from the temporary directory (see
+    `read_doc_vectors`). Yields `(doc_id, [(term, tf-idf)])` for each
+    document in order of docID, sorted by descending tf-idf.
+    """
+    for (doc_id, doc_vec) in read_doc_vectors():
+        tf_idf_vec = []
+        for (term, weighted_tf) in doc_vec:
+            idf = calculate_idf(num_of_docs, dictionary[term].doc_freq)
+            tf_idf_vec.append((term, weighted_tf * idf))
+
+        # Sort by descending tf-idf (ties keep the order of descending weighted tf)
+        tf_idf_vec = sorted(tf_idf_vec, key=lambda term_tf_idf : term_tf_idf[1], reverse=True)
+        yield (doc_id, tf_idf_vec[:num_terms])
+
 def update_block(block, tokens):
     """
     Adds the tokens to the given block as long as the 
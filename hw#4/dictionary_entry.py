@@ -0,0 +1,37 @@
+import pickle
+
+class DictionaryEntry:
+    """
+    Represents an entry in the dictionary. It stores the term, the
+    document frequency of the term and the pointers to its postings list.
+
+    Both pointers are inclusive, i.e. the postings list occupies the bytes
+    `start_pointer` to `end_pointer` of the postings file.
+
+    `max_score` is an upper bound on the score contribution of the term
+    (see `merge.compute_max_score`), which is only known for the final
+    dictionary.
+
+    If `bitmap_size` is not 0, the postings list is followed by the bitmap
+    of the term (see `postings_file.encode_bitmap`), which takes up that
+    many bytes right after `end_pointer`.
+    """
+
+    def __init__(self, term, prev_end_pointer, postings_list, size=None, max_score=0, \
+        bitmap_size=0):
+        """
+        Creates an entry for the postings list that is written right after
+        the one that ends at `prev_end_pointer`.
+
+        `size` is the number of bytes taken up by the postings list on disk.
+        If it is not given, the postings list is assumed to be pickled.
+        """
+        if size is None:
+            size = len(pickle.dumps(postings_list))
+
+        self.term = term
+        self.doc_freq = len(postings_list)
+        self.start_pointer = prev_end_pointer + 1
+        self.end_pointer = self.start_pointer + size - 1
+        self.max_score = max_score
+        self.bitmap_size = bitmap_size
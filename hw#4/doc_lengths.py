@@ -0,0 +1,92 @@
+import struct
+from array import array
+from bisect import bisect_left
+
+"""
+Layout of the lengths file.
+
+The file starts with a header that holds the number of documents N,
+followed by three arrays of N elements each, in native byte order:
+
+    doc_ids          | unsigned 32-bit integers, the sorted docIDs
+    lengths          | doubles, the length of each doc's vector
+    court_importance | unsigned bytes, the court importance of each doc
+
+The index of a document in these arrays is its internal docID, which is
+also used to look it up in the forward index (see `forward_index`).
+"""
+HEADER = struct.Struct("=I")
+
+def write_doc_lengths(lengths_and_court_importance, lengths_file):
+    """
+    Writes the length and court importance of each document in
+    `lengths_and_court_importance` to lengths_file, sorted by docID.
+    """
+    doc_ids = array("I", sorted(lengths_and_court_importance))
+    lengths = array("d")
+    court_importance = array("B")
+
+    for doc_id in doc_ids:
+        (length, importance) = lengths_and_court_importance[doc_id]
+        lengths.append(length)
+        court_importance.append(importance)
+
+    with open(lengths_file, "wb") as f:
+        f.write(HEADER.pack(len(doc_ids)))
+        doc_ids.tofile(f)
+        lengths.tofile(f)
+        court_importance.tofile(f)
+
+class DocLengths:
+    """
+    Represents the lengths and court importance of all documents, which
+    are loaded eagerly from the lengths file into compact arrays.
+
+    A docID is looked up by binary search over the sorted docIDs, so that
+    no per-document object is built when the file is loaded. Callers that
+    look up many docIDs in increasing order (e.g. `query_util.match_bitmap_list`)
+    can pass the internal docID of the previous one as `lo`.
+    """
+
+    def __init__(self, lengths_file):
+        self.doc_ids = array("I")
+        self.lengths = array("d")
+        self.court_importance = array("B")
+
+        with open(lengths_file, "rb") as f:
+            (num_of_docs,) = HEADER.unpack(f.read(HEADER.size))
+            self.doc_ids.fromfile(f, num_of_docs)
+            self.lengths.fromfile(f, num_of_docs)
+            self.court_importance.fromfile(f, num_of_docs)
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def __iter__(self):
+        return iter(self.doc_ids)
+
+    def __contains__(self, doc_id):
+        index = bisect_left(self.doc_ids, doc_id)
+        return index < len(self.doc_ids) and self.doc_ids[index] == doc_id
+
+    def get_internal_id(self, doc_id, lo=0):
+        """
+        Returns the internal docID of `doc_id`, i.e. its index in the
+        sorted docIDs, which is searched for from index `lo` on.
+
+        NOTE: Assumes that `doc_id` exists.
+        """
+        return bisect_left(self.doc_ids, doc_id, lo)
+
+    def get_length(self, doc_id):
+        """
+        Returns the length of the vector of `doc_id`.
+        """
+        return self.lengths[bisect_left(self.doc_ids, doc_id)]
+
+    def get_court_importance(self, doc_id):
+        """
+        Returns the court importance of `doc_id`, i.e. 0, 1 or 2 from
+        small to large.
+        """
+        return self.court_importance[bisect_left(self.doc_ids, doc_id)]
@@ -0,0 +1,74 @@
+import mmap
+import pickle
+import struct
+from array import array
+
+"""
+Layout of the forward index file.
+
+The file starts with a header that holds the number of documents N,
+followed by N + 1 unsigned 64-bit offsets (in native byte order) and the
+records. The vector of the document with internal docID `i` (see
+`doc_lengths`) is pickled at `offsets[i]:offsets[i + 1]`, where the offsets
+are relative to the start of the file.
+"""
+HEADER = struct.Struct("=I")
+OFFSET_TYPECODE = "Q"
+
+def write_forward_index(doc_vectors, num_of_docs, forward_file):
+    """
+    Writes the vector of each of the `num_of_docs` documents to
+    forward_file, ordered by internal docID. `doc_vectors` can be any
+    iterable (e.g. a generator) of `(doc_id, vector)` that is sorted by
+    docID, which is consumed as the records are written.
+
+    NOTE: The offsets are only known once all records are written, so
+    they are written over the space reserved for them at the end.
+    """
+    offsets = array(OFFSET_TYPECODE)
+    offset = HEADER.size + (num_of_docs + 1) * offsets.itemsize
+    offsets.append(offset)
+
+    with open(forward_file, "wb") as f:
+        f.write(HEADER.pack(num_of_docs))
+        f.seek(offset)
+        for (_, vector) in doc_vectors:
+            record = pickle.dumps(vector)
+            f.write(record)
+            offset += len(record)
+            offsets.append(offset)
+
+        assert len(offsets) == num_of_docs + 1, "a vector is required for every document"
+        f.seek(HEADER.size)
+        offsets.tofile(f)
+
+class ForwardIndex:
+    """
+    Represents a forward index file. The file is memory-mapped once, and
+    the vector of a document is only unpickled when it is requested.
+    """
+
+    def __init__(self, forward_file):
+        self.file = open(forward_file, 'rb')
+        self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (num_of_docs,) = HEADER.unpack_from(self.mmap)
+        self.offsets = array(OFFSET_TYPECODE)
+        self.offsets.frombytes(self.mmap[HEADER.size:HEADER.size + \
+            (num_of_docs + 1) * self.offsets.itemsize])
+
+    def get_vector(self, internal_id):
+        """
+        Returns the vector of the document with the internal docID
+        `internal_id`.
+        """
+        start = self.offsets[internal_id]
+        end = self.offsets[internal_id + 1]
+        return pickle.loads(self.mmap[start:end])
+
+    def close(self):
+        """
+        Closes the forward index file.
+        """
+        self.mmap.close()
+        self.file.close()
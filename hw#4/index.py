@@ -4,12 +4,17 @@ import csv
 import sys
 import getopt
 import pickle
-from create_blocks import create_blocks_and_find_lengths
-from compression import encode_gap
+from create_blocks import create_blocks_and_find_lengths, compute_feedback_vectors
 from merge import merge_blocks
 from temp_dir_util import setup_dirs, remove_dirs
 from term_info import TermInfo
-from index_util import write_lengths_and_dictionary
+from index_util import write_dictionary
+from io_util import STEMS_FILE, STOPWORDS_FILE, LENGTHS_FILE, FORWARD_FILE, EXPANSIONS_FILE, \
+    get_side_file_path
+from doc_lengths import write_doc_lengths
+from forward_index import write_forward_index
+from tokenizer import stem_cache, save_stopwords
+from query_expansion import build_expansion_table, write_expansion_table
 
 def get_docs_from_csv(data_path):
     """
@@ -18,7 +23,8 @@ def get_docs_from_csv(data_path):
     For the baseline model, combine all the text, only store two features
     for each document: docIDs, text.
 
-    return a list, each element contains doc_id and doc_text.
+    yield the documents one at a time, each element contains doc_id and doc_text.
+    The rows are read lazily, so the whole dataset is never held in memory.
     """
 
     csv.field_size_limit(sys.maxsize)
@@ -27,16 +33,24 @@ def get_docs_from_csv(data_path):
         csv_reader = csv.reader(csv_file, delimiter=',')
         next(csv_reader)
         # docIDs are already sorted in the original dataset
-        docs = [row for row in csv_reader]
-        return docs
+        for row in csv_reader:
+            yield row
 
 def usage():
-    print("usage: " + sys.argv[0] + " -i dataset-file -d dictionary-file -p postings-file")
+    print("usage: " + sys.argv[0] + " -i dataset-file -d dictionary-file -p postings-file [-w num-workers] [-b] [-e]")
+    print("  -b: also index frequent biwords (pairs of adjacent words) for faster phrase queries")
+    print("  -e: also precompute the WordNet expansions of the terms for faster query expansion")
 
-def build_index(in_dataset, out_dict, out_postings):
+def build_index(in_dataset, out_dict, out_postings, num_workers=1, use_biwords=False, \
+    use_expansions=False):
     """
     Builds index from documents stored in the dataset file,
     then write results to the dictionary file and postings file
+
+    The documents are tokenized by `num_workers` processes. When
+    `use_biwords` is set, frequent biwords are indexed as well. When
+    `use_expansions` is set, the expanded terms of every term are precomputed
+    (see `query_expansion.ExpansionTable`).
     """
     print('indexing...')
 
@@ -44,12 +58,29 @@ def build_index(in_dataset, out_dict, out_postings):
 
     # create directory to store intermediate dictionaries
     setup_dirs(out_dict, out_postings)
-    lengths_and_court_importance = create_blocks_and_find_lengths(documents)
+    lengths_and_court_importance = create_blocks_and_find_lengths(documents, num_workers, \
+        use_biwords)
+
+    # persist the stems learned while tokenizing and the stopwords, for query tokenization
+    stem_cache.save(get_side_file_path(out_dict, STEMS_FILE))
+    save_stopwords(get_side_file_path(out_dict, STOPWORDS_FILE))
+
+    merge_blocks(out_dict, out_postings, lengths_and_court_importance)
 
-    merge_blocks()
-    
-    encode_gap(out_dict, out_postings)
-    save_dictionary_lengths_and_court(out_dict, lengths_and_court_importance)
+    dictionary = save_dictionary_lengths_and_court(out_dict, lengths_and_court_importance)
+
+    # precompute the top terms of each document for relevance feedback, which are
+    # stored in the forward index and only read for the feedback documents; the
+    # document vectors are streamed from the temporary directory
+    feedback_vectors = compute_feedback_vectors(dictionary, len(lengths_and_court_importance))
+    write_forward_index(feedback_vectors, len(lengths_and_court_importance), \
+        get_side_file_path(out_dict, FORWARD_FILE))
+
+    # precompute the WordNet expansions of the terms, so that query expansion is a
+    # lookup for every term in the dictionary
+    if use_expansions:
+        expansions = build_expansion_table(dictionary)
+        write_expansion_table(expansions, get_side_file_path(out_dict, EXPANSIONS_FILE))
 
     # remove directory that stores intermediate dictionaries
     remove_dirs()
@@ -57,10 +88,9 @@ def build_index(in_dataset, out_dict, out_postings):
 def save_dictionary_lengths_and_court(out_dict, lengths_and_court_importance):
     """
     Loads the dictionary that has been saved at `out_dict` and save it 
-    as a dict. In addition, save the `lengths_and_court_importance` at `out_dict`.
-
-    `out_dict` will thus store two pickle objects. The first is `lenghts_and_court_importance`.
-    The second is the dictionary.
+    as a dict, which is also returned. In addition, save the lengths and
+    court importance in `lengths_and_court_importance` to the lengths file
+    that is stored alongside `out_dict`.
 
     NOTE: Assumes that the original dictionary is a list.
     """
@@ -74,30 +104,44 @@ def save_dictionary_lengths_and_court(out_dict, lengths_and_court_importance):
         dictionary_as_map[entry.term] = term_info
 
     dir_path = '.'
-    write_lengths_and_dictionary(lengths_and_court_importance, dictionary_as_map,\
-        dir_path, out_dict)
-
-
-input_file_dataset = output_file_dictionary = output_file_postings = None
-
-try:
-    opts, args = getopt.getopt(sys.argv[1:], 'i:d:p:')
-except getopt.GetoptError:
-    usage()
-    sys.exit(2)
-
-for o, a in opts:
-    if o == '-i': # dataset file
-        input_file_dataset = a
-    elif o == '-d': # dictionary file
-        output_file_dictionary = a
-    elif o == '-p': # postings file
-        output_file_postings = a
-    else:
-        assert False, "unhandled option"
-
-if input_file_dataset == None or output_file_postings == None or output_file_dictionary == None:
-    usage()
-    sys.exit(2)
-
-build_index(input_file_dataset, output_file_dictionary, output_file_postings)
+    write_dictionary(dictionary_as_map, dir_path, out_dict)
+    write_doc_lengths(lengths_and_court_importance, get_side_file_path(out_dict, LENGTHS_FILE))
+
+    return dictionary_as_map
+
+
+# Worker processes re-import this module, so only run when executed directly
+if __name__ == "__main__":
+    input_file_dataset = output_file_dictionary = output_file_postings = None
+    num_workers = 1
+    use_biwords = False
+    use_expansions = False
+
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'i:d:p:w:be')
+    except getopt.GetoptError:
+        usage()
+        sys.exit(2)
+
+    for o, a in opts:
+        if o == '-i': # dataset file
+            input_file_dataset = a
+        elif o == '-d': # dictionary file
+            output_file_dictionary = a
+        elif o == '-p': # postings file
+            output_file_postings = a
+        elif o == '-w': # number of worker processes
+            num_workers = int(a)
+        elif o == '-b': # index biwords
+            use_biwords = True
+        elif o == '-e': # precompute query expansions
+            use_expansions = True
+        else:
+            assert False, "unhandled option"
+
+    if input_file_dataset == None or output_file_postings == None or output_file_dictionary == None:
+        usage()
+        sys.exit(2)
+
+    build_index(input_file_dataset, output_file_dictionary, output_file_postings, num_workers, \
+        use_biwords, use_expansions)
@@ -1,23 +1,46 @@
+import os
 import pickle
 from math import sqrt
 
-from query_util import get_doc_info
+from query_util import Bitmap, ListCursor, PostingList, PostingBitmap, TermPostingsCursor
+from postings_file import PostingsCursor
+from posting_list_cache import PostingListCache
 
-def load_lengths_and_dictionary(dict_file):
+"""
+Names of the files that are stored alongside the dictionary file.
+"""
+STEMS_FILE = "stems"
+STOPWORDS_FILE = "stopwords"
+LENGTHS_FILE = "lengths"
+FORWARD_FILE = "forward"
+EXPANSIONS_FILE = "expansions"
+
+"""
+Decoded posting lists (and bitmaps), which are shared by all search engines
+in the process. They are keyed by the identity of the open postings file
+(see `PostingsFile.identity`) rather than by its path, so that a postings
+file that is rebuilt at the same path never gets the posting lists of the
+old one, and one that is opened through different paths shares them.
+"""
+posting_list_cache = PostingListCache()
+
+def get_side_file_path(dict_file, name):
+    """
+    Returns the path of the file called `name` that is stored alongside
+    `dict_file`, e.g. `dictionary_stems.txt` for `dictionary.txt`.
     """
-    Load lengths and dictionary from dict_file.
+    (root, ext) = os.path.splitext(dict_file)
+    return "{}_{}{}".format(root, name, ext)
 
-    Returns a tuple `(lengths, dictionary)`.
+def load_dictionary(dict_file):
+    """
+    Load dictionary from dict_file.
 
-    NOTE: length includes the court importance information. In particular,
-    length is in fact (doc length, court importance).
+    NOTE: The lengths and court importance of the documents are stored in
+    the lengths file (see `doc_lengths`) instead.
     """
     with open(dict_file, "rb") as f:
-        lengths = pickle.load(f)
-        dictionary = pickle.load(f)
-        return (lengths, dictionary)
-    
-    assert False
+        return pickle.load(f)
 
 def load_term_info(term, dictionary):
     """
@@ -31,38 +54,94 @@ def load_term_info(term, dictionary):
 
     return dictionary[term]
 
-def load_posting_list(term, dictionary, postings_file):
+def load_postings(term, dictionary, postings_file):
     """
-    Load posting list of a specified term from dictionary and postings file.
-    If the term does not exist, return empty list instead.
+    Load the decoded postings of a specified term from dictionary and postings
+    file, i.e. its `(doc_ids, tfs, position_lists)`.
+    If the term does not exist, return None instead.
+
+    NOTE: `postings_file` is a `PostingsFile` that is kept open by the caller.
+    The decoded postings are kept in `posting_list_cache`, so that the posting
+    list of a term is only read from the postings file on a cache miss. They
+    are shared, so they must never be modified.
     """
     info = load_term_info(term, dictionary)
     
     if info is None:
-        return []
+        return None
     
     index_start = info.start_pointer
     index_end = info.end_pointer
 
-    posting_list = load_posting_list_from_pickle(postings_file, index_start, index_end)
-    result = []
-    prev_doc_id = 0
-    for posting in posting_list:
-        doc_info = get_doc_info(term, posting, prev_doc_id)
-        result.append(doc_info)
-        prev_doc_id = doc_info[0]
-    return result
+    key = (postings_file.identity, index_start)
+    postings = posting_list_cache.get(key)
+    if postings is None:
+        postings = postings_file.read(index_start, index_end).decode()
+        posting_list_cache.put(key, postings)
+
+    return postings
+
+def load_posting_list(term, dictionary, postings_file, lengths=None):
+    """
+    Load posting list of a specified term from dictionary and postings file.
+    If the term does not exist, return empty list instead.
+
+    If the `lengths` of the documents (see `DocLengths`) are given and the term
+    has a bitmap in the postings file (see `merge.BITMAP_MIN_DENSITY`), its
+    posting list is loaded as a `PostingBitmap` (see `load_posting_bitmap`)
+    instead.
+
+    Otherwise, the posting list is a `PostingList` over the decoded postings
+    (see `load_postings`), which only builds the doc info of a posting when
+    it is accessed.
+    """
+    info = load_term_info(term, dictionary)
+
+    if info is None:
+        return []
+
+    if lengths is not None and info.bitmap_size > 0:
+        return load_posting_bitmap(term, dictionary, postings_file, lengths)
 
-def load_posting_list_from_pickle(postings_file, index_start, index_end):
+    return PostingList(term, load_postings(term, dictionary, postings_file))
+
+def load_posting_bitmap(term, dictionary, postings_file, lengths):
     """
-    Load posting list that starts at `index_start` and ends at `index_end`
-    in the given postings file.
+    Load the posting list of a specified term as a `PostingBitmap` over the
+    internal docIDs of `lengths`, whose bitmap is read from the postings file.
+
+    NOTE: Assumes that the term has a bitmap. Like the decoded postings, the
+    bitmap is kept in `posting_list_cache`.
     """
-    with open(postings_file, "rb") as f:
-        f.seek(index_start)
-        posting_list_as_bytes = f.read(index_end - index_start + 1)
-        posting_list = pickle.loads(posting_list_as_bytes)
-        if not posting_list:
-            assert False
-
-        return posting_list
+    postings = load_postings(term, dictionary, postings_file)
+
+    info = load_term_info(term, dictionary)
+    key = (postings_file.identity, info.start_pointer, "bitmap")
+    bitmap = posting_list_cache.get(key)
+    if bitmap is None:
+        bitmap = Bitmap(postings_file.read_bitmap(info.end_pointer + 1, info.bitmap_size))
+        posting_list_cache.put(key, bitmap, bitmap.get_size())
+
+    return PostingBitmap(term, postings, bitmap, lengths)
+
+def load_posting_list_cursor(term, dictionary, postings_file):
+    """
+    Load a cursor over the posting list of a specified term (see
+    `query_util.intersect`). If the term does not exist, the cursor is empty.
+
+    NOTE: If the decoded postings of the term are not cached and span more
+    than one block (see `postings_file`), the cursor reads them from the
+    postings file instead, decoding only the blocks of postings that it does
+    not skip over.
+    """
+    info = load_term_info(term, dictionary)
+
+    if info is None:
+        return ListCursor([])
+
+    view = postings_file.read(info.start_pointer, info.end_pointer)
+    if (postings_file.identity, info.start_pointer) in posting_list_cache or \
+        view.get_block_count() <= 1:
+        return ListCursor(load_posting_list(term, dictionary, postings_file))
+
+    return TermPostingsCursor(term, PostingsCursor(view))
@@ -1,161 +1,224 @@
+import heapq
 import os
+import pickle
 import shutil
+from itertools import groupby
+
+from temp_dir_util import TEMP_DIR, TO_MERGE_DIR, DICT_FILE, LISTS_FILE
+from index_util import write_dictionary
+from dictionary_entry import DictionaryEntry
+from compression import POSTINGS_CODEC, get_list_w_encoded_gap
+from postings_file import encode_postings_list, encode_bitmap, write_file_header
+from query_util import calculate_weighted_tf, is_phrase
+
+"""
+Minimum document frequency of a biword (see `tokenizer.tokenize_biwords`)
+for it to be kept in the index. Phrases made up of rarer biwords are found
+by intersecting the positional posting lists of their words instead.
+"""
+BIWORD_MIN_DOC_FREQ = 10
+
+"""
+Terms that occur in at least this fraction of the documents have the bitmap
+of their postings stored after their postings list (see
+`query_util.PostingBitmap`).
+"""
+BITMAP_MIN_DENSITY = 1 / 16
+
+"""
+Maximum number of blocks that are merged at once. Each block that is being
+merged keeps a file open, so blocks are merged in passes of at most this many
+blocks until the final merge does not exceed it either.
+"""
+MAX_FAN_IN = 64
+
+def merge_blocks(out_dict, out_postings, lengths_and_court_importance, \
+    codec=POSTINGS_CODEC):
+    """
+    Merges (k-way merge) the postings and dictionaries obtained from all
+    the blocks.
+
+    If there are more than `MAX_FAN_IN` blocks, they are first merged into
+    fewer, larger blocks (see `reduce_blocks`). The dictionaries of the
+    remaining blocks are then opened at once, and their terms are streamed
+    through a heap that is keyed on the term. The merged postings
+    lists are gap encoded and written directly to the user-specified
+    `out_dict` and `out_postings` (see `postings_file` for the format).
+
+    The document lengths in `lengths_and_court_importance` are used to
+    compute the upper bound on the score contribution of each term.
+
+    Biwords that occur in fewer than `BIWORD_MIN_DOC_FREQ` documents are
+    dropped, and terms that occur in at least `BITMAP_MIN_DENSITY` of the
+    documents get a bitmap of the internal docIDs of their postings (see
+    `postings_file.encode_bitmap`).
+    """
+    num_of_docs = len(lengths_and_court_importance)
+    internal_ids = {doc_id: internal_id for (internal_id, doc_id) \
+        in enumerate(sorted(lengths_and_court_importance))}
+
+    block_dirs = reduce_blocks(get_block_dirs())
+    blocks = [read_block(block_dir, block_index) for (block_index, block_dir) \
+        in enumerate(block_dirs)]
+
+    dictionary = []
+    dir_path = '.'
+
+    with open(out_postings, 'wb') as f:
+        prev_end_pointer = write_file_header(f, codec) - 1
+
+        for (term, entries) in groupby(heapq.merge(*blocks), key=get_term):
+            postings_list = merge_postings_lists(entries)
+            if is_phrase(term) and len(postings_list) < BIWORD_MIN_DOC_FREQ:
+                continue
+
+            postings_list_w_encoded_gap = get_list_w_encoded_gap(postings_list)
+
+            encoded_postings_list = encode_postings_list(postings_list_w_encoded_gap, \
+                codec)
+            f.write(encoded_postings_list)
+
+            bitmap_size = 0
+            if not is_phrase(term) and len(postings_list) >= BITMAP_MIN_DENSITY * num_of_docs:
+                bitmap = encode_bitmap((internal_ids[doc_id] for (doc_id, _, _) \
+                    in postings_list), num_of_docs)
+                f.write(bitmap)
+                bitmap_size = len(bitmap)
 
-from temp_dir_util import TEMP_DIR, TO_MERGE_DIR, MERGED_DIR, move_from_merged
-from index_util import get_dictionary_and_postings_file, get_postings_list, \
-    update_dictionary_and_write_list, write_dictionary
+            max_score = compute_max_score(postings_list, lengths_and_court_importance)
+            entry = DictionaryEntry(term, prev_end_pointer, \
+                postings_list_w_encoded_gap, len(encoded_postings_list), max_score, \
+                bitmap_size)
+            dictionary.append(entry)
+            prev_end_pointer = entry.end_pointer + bitmap_size
 
-def merge_blocks():
+    write_dictionary(dictionary, dir_path, out_dict)
+
+def get_block_dirs():
     """
-    Merges (2-way merge) the postings and dictionaries obtained from the 
-    blocks recursively, until no further merging has to be done.
+    Returns the directories of the blocks, sorted by shard and then by the
+    order in which the blocks were created (see `Block`).
     """
-    while not is_merge_completed():
-        dirs = os.scandir(os.path.join(TEMP_DIR, TO_MERGE_DIR))
-        to_merge_dirs = []
-
-        for directory in dirs:
-            to_merge_dirs.append(directory)
+    block_dirs = list(os.scandir(os.path.join(TEMP_DIR, TO_MERGE_DIR)))
+    return sorted(block_dirs, key=get_block_order)
 
-            if len(to_merge_dirs) < 2:
+def reduce_blocks(block_dirs, max_fan_in=MAX_FAN_IN):
+    """
+    Merges runs of at most `max_fan_in` consecutive blocks in `block_dirs`
+    into single blocks, in as many passes as it takes for at most
+    `max_fan_in` blocks to remain, and returns the directories of the
+    remaining blocks in order.
+
+    As consecutive blocks hold consecutive ranges of docIDs, the merged
+    blocks do too. Biwords are only dropped by the final merge, which knows
+    their document frequency over all blocks.
+    """
+    merge_pass = 0
+    while len(block_dirs) > max_fan_in:
+        merged_block_dirs = []
+        for start in range(0, len(block_dirs), max_fan_in):
+            run = block_dirs[start:start + max_fan_in]
+            if len(run) == 1:
+                merged_block_dirs.append(run[0])
                 continue
 
-            merge_dirs(to_merge_dirs)
-            [shutil.rmtree(str(to_merge_dir.path)) for to_merge_dir \
-                in to_merge_dirs]
-            to_merge_dirs = []
-        
-        move_from_merged()
+            merged_block_dir = os.path.join(TEMP_DIR, "merged_{}_{}".format(merge_pass, \
+                len(merged_block_dirs)))
+            merge_block_run(run, merged_block_dir)
+            merged_block_dirs.append(merged_block_dir)
+
+            for block_dir in run:
+                shutil.rmtree(block_dir)
 
-def is_merge_completed():
+        block_dirs = merged_block_dirs
+        merge_pass += 1
+
+    return block_dirs
+
+def merge_block_run(block_dirs, merged_block_dir):
     """
-    Checks whether the merge process is completed. It returns
-    `True` if there is only one dictionary and postings lists;
-    otherwise, it returns `False`.
+    Merges the blocks in `block_dirs` into a single block that is saved in
+    `merged_block_dir`, in the same format as `Block.save_dictionary`.
+
+    The merged postings lists are written one after another, so only one of
+    them is kept in memory at any one time.
     """
-    num_files = 0
-    files = os.scandir(os.path.join(TEMP_DIR, TO_MERGE_DIR))
+    blocks = [read_block(block_dir, block_index) for (block_index, block_dir) \
+        in enumerate(block_dirs)]
+
+    os.mkdir(merged_block_dir)
+    dictionary = []
+    prev_end_pointer = -1
+
+    with open(os.path.join(merged_block_dir, LISTS_FILE), 'wb') as f:
+        for (term, entries) in groupby(heapq.merge(*blocks), key=get_term):
+            postings_list = merge_postings_lists(entries)
+            encoded_postings_list = pickle.dumps(postings_list)
+            f.write(encoded_postings_list)
+
+            entry = DictionaryEntry(term, prev_end_pointer, postings_list, \
+                len(encoded_postings_list))
+            dictionary.append(entry)
+            prev_end_pointer = entry.end_pointer
 
-    for _ in files:
-        num_files += 1
-        
-        if num_files > 1:
-            return False
-    
-    return True
+    with open(os.path.join(merged_block_dir, DICT_FILE), 'wb') as f:
+        pickle.dump(dictionary, f)
 
-def merge_dirs(to_merge_dirs):
-    """ 
-    Merges the two directories which are specified in `to_merge_dirs`.
-    At any one time, at most two postings lists (of the same term) are
-    merged.
+def get_block_order(block_dir):
     """
-    assert len(to_merge_dirs) == 2, 'Merging invalid number of directories'
+    Returns `(shard_id, dictionary_id)` of the block saved in `block_dir`.
+    """
+    (shard_id, dictionary_id) = block_dir.name.split("_")
+    return (int(shard_id), int(dictionary_id))
 
-    (dictionary_0, postings_file_0) = get_dictionary_and_postings_file(to_merge_dirs[0])
-    (dictionary_1, postings_file_1) = get_dictionary_and_postings_file(to_merge_dirs[1])
+def read_block(block_dir, block_index):
+    """
+    Reads the block saved in `block_dir` term by term.
 
-    merged_dir_name = str(min(int(to_merge_dirs[0].name), \
-        int(to_merge_dirs[1].name)))
-    merged_dir_path = os.path.join(TEMP_DIR, MERGED_DIR, merged_dir_name)
+    Yields `(term, block_index, postings_list)` for each term of the block,
+    in sorted order of the terms. The postings lists are read one after
+    another, so only one of them is kept in memory at any one time.
+    """
+    with open(os.path.join(block_dir, DICT_FILE), 'rb') as f:
+        dictionary = pickle.load(f)
 
-    if not os.path.isdir(merged_dir_path):
-        os.mkdir(merged_dir_path)
+    with open(os.path.join(block_dir, LISTS_FILE), 'rb') as f:
+        for entry in dictionary:
+            yield (entry.term, block_index, pickle.load(f))
 
-    dictionary_index_0 = 0
-    dictionary_index_1 = 0
+def get_term(block_entry):
+    """
+    Returns the term of an entry yielded by `read_block`.
+    """
+    return block_entry[0]
 
-    term = None
-    prev_end_pointer = -1
-    merged_dictionary = []
-
-    while dictionary_index_0 < len(dictionary_0) and dictionary_index_1 < len(dictionary_1):
-        term_0 = dictionary_0[dictionary_index_0].term
-        term_1 = dictionary_1[dictionary_index_1].term
-
-        updated_postings_list = []
-
-        if term_0 == term_1:
-            term = term_0
-
-            list_0 = get_postings_list(dictionary_0, dictionary_index_0, \
-                postings_file_0)
-            list_1 = get_postings_list(dictionary_1, dictionary_index_1, \
-                postings_file_1)
-            updated_postings_list = merge_postings_lists(list_0, list_1)
-
-            dictionary_index_0 += 1
-            dictionary_index_1 += 1
-        elif term_0 < term_1:
-            term = term_0
-            updated_postings_list = get_postings_list(dictionary_0, \
-                dictionary_index_0, postings_file_0)
-            dictionary_index_0 += 1
-        else:
-            term = term_1
-            updated_postings_list = get_postings_list(dictionary_1, \
-                dictionary_index_1, postings_file_1)
-            dictionary_index_1 += 1
-        
-        entry = update_dictionary_and_write_list(updated_postings_list, \
-            merged_dir_path, term, prev_end_pointer, merged_dictionary)
-        prev_end_pointer = entry.end_pointer
-
-    while dictionary_index_0 < len(dictionary_0):
-        term = dictionary_0[dictionary_index_0].term
-        postings_list = get_postings_list(dictionary_0, dictionary_index_0, postings_file_0)
-
-        entry = update_dictionary_and_write_list(postings_list, merged_dir_path, \
-            term, prev_end_pointer, merged_dictionary)
-        prev_end_pointer = entry.end_pointer
-
-        dictionary_index_0 += 1
-    
-    while dictionary_index_1 < len(dictionary_1):
-        term = dictionary_1[dictionary_index_1].term
-        postings_list = get_postings_list(dictionary_1, dictionary_index_1, postings_file_1)
-
-        entry = update_dictionary_and_write_list(postings_list, merged_dir_path, \
-            term, prev_end_pointer, merged_dictionary)
-        prev_end_pointer = entry.end_pointer
-
-        dictionary_index_1 += 1
-    
-    write_dictionary(merged_dictionary, merged_dir_path)
-
-def merge_postings_lists(list_0, list_1):
-    """
-    Merges postings lists.
-    """
-    index_0 = 0
-    index_1 = 0
+def merge_postings_lists(entries):
+    """
+    Merges the postings lists of the same term from different blocks.
+
+    Since the blocks (and the shards) are created in order of non-decreasing
+    document IDs, and `entries` are ordered by block, the postings lists only have to be
+    concatenated.
+    """
     postings_list = []
 
-    while index_0 < len(list_0) and index_1 < len(list_1):
-        doc_id_0 = list_0[index_0][0]
-        doc_id_1 = list_1[index_1][0]
-
-        token_info_0 = list_0[index_0]
-        token_info_1 = list_1[index_1]
-
-        if doc_id_0 == doc_id_1:
-            # Will never reach this state
-            postings_list.append(token_info_0)
-            index_0 += 1
-            index_1 += 1
-        elif doc_id_0 < doc_id_1:
-            postings_list.append(token_info_0)
-            index_0 += 1
-        else:
-            postings_list.append(token_info_1)
-            index_1 += 1
-    
-    while index_0 < len(list_0):
-        postings_list.append(list_0[index_0])
-        index_0 += 1
-
-    while index_1 < len(list_1):
-        postings_list.append(list_1[index_1])
-        index_1 += 1
-
-    return postings_list
\ No newline at end of file
+    for (_, _, block_postings_list) in entries:
+        postings_list.extend(block_postings_list)
+
+    return postings_list
+
+def compute_max_score(postings_list, lengths_and_court_importance):
+    """
+    Computes the maximum weighted tf of the term, normalised by document
+    length, over all the postings in `postings_list`.
+
+    Multiplied by the weight of the term in a query, this is an upper bound
+    on the contribution of the term to the cosine score of any document.
+    """
+    max_score = 0
+
+    for (doc_id, tf, _) in postings_list:
+        doc_length = lengths_and_court_importance[doc_id][0]
+        max_score = max(max_score, calculate_weighted_tf(tf) / doc_length)
+
+    return max_score
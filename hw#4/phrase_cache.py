@@ -0,0 +1,82 @@
+import threading
+from collections import OrderedDict
+
+class PhraseCache:
+    """
+    Represents a bounded LRU cache of the posting lists of phrases, which
+    is shared by all queries that are run over an index.
+
+    Each posting list is keyed by the phrase and whether it is strict (see
+    `SearchEngine.get_posting_list`), as the strict and non-strict posting
+    lists of a phrase differ. The cache is bounded by the total number of
+    postings in the posting lists, and the least recently used posting
+    lists are evicted until the cache fits in its bound again. Hits,
+    misses and evictions are counted.
+
+    NOTE: The cache is thread-safe. Posting lists and their doc infos are
+    never modified (see `query_util.merge_doc_info`), so the cache hands out
+    the cached posting lists themselves, without copying them.
+    """
+    MAX_POSTINGS = 1000000
+
+    def __init__(self, max_postings=MAX_POSTINGS):
+        self.max_postings = max_postings
+        self.cache = OrderedDict()
+        self.num_of_postings = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, phrase, is_strict):
+        """
+        Returns the posting list of the phrase, or None if it is not cached.
+        """
+        key = (phrase, is_strict)
+        with self.lock:
+            posting_list = self.cache.get(key)
+            if posting_list is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return posting_list
+
+    def put(self, phrase, is_strict, posting_list):
+        """
+        Adds the posting list of the phrase to the cache, evicting the least
+        recently used posting lists until the cache fits in its bound.
+        """
+        if len(posting_list) > self.max_postings:
+            return
+
+        key = (phrase, is_strict)
+
+        with self.lock:
+            if key in self.cache:
+                self.num_of_postings -= len(self.cache.pop(key))
+
+            self.cache[key] = posting_list
+            self.num_of_postings += len(posting_list)
+
+            while self.num_of_postings > self.max_postings:
+                (_, evicted_postings) = self.cache.popitem(last=False)
+                self.num_of_postings -= len(evicted_postings)
+                self.evictions += 1
+
+    def get_stats(self):
+        """
+        Returns the hits, misses, evictions, size (number of phrases),
+        number of postings and hit rate of the cache.
+        """
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self.cache),
+                'postings': self.num_of_postings,
+                'hit_rate': self.hits / lookups if lookups > 0 else 0
+            }
@@ -0,0 +1,124 @@
+import sys
+import threading
+from collections import OrderedDict
+
+class PostingListCache:
+    """
+    Represents a bounded LRU cache of decoded posting lists, which sits in
+    front of the postings file.
+
+    The cache is bounded by the (approximate) number of bytes taken up by
+    the posting lists rather than by their number, since the posting list
+    of a common term can be many times larger than that of a rare term.
+    The least recently used posting lists are evicted until the cache fits
+    in its budget again, and a posting list that is larger than the whole
+    budget is never cached. Hits, misses and evictions are counted.
+
+    NOTE: The cache is thread-safe. The posting lists in the cache are
+    shared by all callers, so they must never be modified.
+    """
+    MAX_BYTES = 64 * 1024 * 1024
+
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.cache = OrderedDict()
+        self.num_of_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Returns the posting list of `key`, or None if it is not cached.
+        """
+        with self.lock:
+            entry = self.cache.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.cache.move_to_end(key)
+            (posting_list, _) = entry
+            return posting_list
+
+    def __contains__(self, key):
+        """
+        Returns True if the posting list of `key` is cached. Unlike `get`,
+        neither hits nor misses are counted.
+        """
+        with self.lock:
+            return key in self.cache
+
+    def put(self, key, posting_list, size=None):
+        """
+        Adds the posting list of `key`, i.e. its `(doc_ids, tfs, position_lists)`,
+        to the cache, evicting the least recently used posting lists until the
+        cache fits in its budget.
+
+        `size` is the number of bytes taken up by the posting list. If it is
+        not given, it is estimated with `get_size`.
+        """
+        if size is None:
+            size = get_size(posting_list)
+        if size > self.max_bytes:
+            return
+
+        with self.lock:
+            if key in self.cache:
+                (_, prev_size) = self.cache.pop(key)
+                self.num_of_bytes -= prev_size
+
+            self.cache[key] = (posting_list, size)
+            self.num_of_bytes += size
+
+            while self.num_of_bytes > self.max_bytes:
+                (_, (_, evicted_size)) = self.cache.popitem(last=False)
+                self.num_of_bytes -= evicted_size
+                self.evictions += 1
+
+    def remove_file(self, identity):
+        """
+        Removes the posting lists of the postings file with `identity` (see
+        `PostingsFile.identity`), i.e. the ones whose keys start with it.
+        """
+        with self.lock:
+            for key in [key for key in self.cache if key[0] == identity]:
+                (_, size) = self.cache.pop(key)
+                self.num_of_bytes -= size
+
+    def clear(self):
+        """
+        Removes all posting lists from the cache.
+        """
+        with self.lock:
+            self.cache.clear()
+            self.num_of_bytes = 0
+
+    def get_stats(self):
+        """
+        Returns the hits, misses, evictions, size (number of posting lists),
+        bytes and hit rate of the cache.
+        """
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self.cache),
+                'bytes': self.num_of_bytes,
+                'hit_rate': self.hits / lookups if lookups > 0 else 0
+            }
+
+def get_size(posting_list):
+    """
+    Returns the approximate number of bytes taken up by a decoded posting
+    list, i.e. its `(doc_ids, tfs, position_lists)`.
+    """
+    (doc_ids, tfs, position_lists) = posting_list
+    size = sys.getsizeof(doc_ids) + sys.getsizeof(tfs) + sys.getsizeof(position_lists)
+    for positions in position_lists:
+        size += sys.getsizeof(positions)
+    return size
@@ -0,0 +1,415 @@
+import os
+import mmap
+import struct
+import zlib
+from array import array
+from bisect import bisect_left
+
+from codec import CODEC_FIXED, CODECS
+
+"""
+Layout of the postings file.
+
+The file starts with a header that holds `MAGIC`, the codec that is used
+for the postings lists and the skip interval `k`. Each postings list is
+then stored as one contiguous region, which starts with a header that
+holds the document frequency and the sizes (in bytes) of the gaps, tfs
+and offsets sections below, followed by the sections:
+
+    skips     | one skip entry for every k postings but the first k
+    gaps      | df integers, the gap between adjacent docIDs
+    tfs       | df integers, the (zone weighted) term frequencies
+    offsets   | df + 1 integers, the positions of the i-th posting are
+              | found at positions[offsets[i]:offsets[i + 1]]
+    positions | the position lists of all postings, one after another
+
+The postings are split into blocks of k postings. The skip entry of each
+block (but the first one) holds the docID of the last posting before the
+block, followed by the offsets (in bytes) at which the block starts in
+the gaps, tfs, offsets and positions sections. Skip entries are always
+stored as `SKIP_ENTRY` unsigned 32-bit integers in native byte order.
+
+With `CODEC_FIXED`, every integer is an unsigned 32-bit integer in native
+byte order, so that each section can be used directly as an array without
+copying it. With any other codec (see `codec`), the positions are delta
+encoded within each posting, the offsets section only stores the number
+of positions of each posting, and every block of every section is
+compressed on its own, so that a block can be decoded without decoding
+the blocks before it.
+
+The postings list of a frequent term may be followed by the region of its
+bitmap (see `encode_bitmap`), whose size is kept in the dictionary.
+"""
+MAGIC = b"IRP4"
+TYPECODE = "I"
+FILE_HEADER = struct.Struct("=4sBxH")
+HEADER = struct.Struct("=IIII")
+
+"""
+Number of postings in each block of a postings list, i.e. the distance
+between adjacent skip entries.
+"""
+SKIP_INTERVAL = 64
+SKIP_ENTRY = 5
+
+assert array(TYPECODE).itemsize == 4, 'Unsupported platform'
+
+def encode_postings_list(postings_list, codec, skip_interval=SKIP_INTERVAL):
+    """
+    Encodes a postings list with encoded gap, i.e. a list of
+    `(gap, tf, positions)` tuples, to the bytes of its region.
+    """
+    sections = [bytearray() for _ in range(4)]
+    skips = array(TYPECODE)
+    doc_id = 0
+
+    if codec == CODEC_FIXED:
+        # The offsets section is cumulative, so it is encoded as a whole
+        sections[2] += array(TYPECODE, [0]).tobytes()
+
+    for start in range(0, len(postings_list), skip_interval):
+        block = postings_list[start:start + skip_interval]
+        if start > 0:
+            skips.append(doc_id)
+            skips.extend(len(section) for section in sections)
+            if codec == CODEC_FIXED:
+                # Offsets are shifted by the leading 0 of the section
+                skips[-2] -= array(TYPECODE).itemsize
+
+        for (section, encoded_section) in zip(sections, \
+            encode_block(block, codec, len(sections[3]) // 4)):
+            section += encoded_section
+        doc_id += sum(gap for (gap, _, _) in block)
+
+    header = HEADER.pack(len(postings_list), len(sections[0]), \
+        len(sections[1]), len(sections[2]))
+
+    return header + skips.tobytes() + b"".join(sections)
+
+def encode_block(block, codec, num_of_positions=0):
+    """
+    Encodes a block of postings with encoded gap to its part of the gaps,
+    tfs, offsets and positions sections.
+
+    `num_of_positions` is the number of positions in the blocks before,
+    which the offsets of `CODEC_FIXED` start from.
+    """
+    gaps = array(TYPECODE)
+    tfs = array(TYPECODE)
+    offsets = array(TYPECODE)
+    positions = array(TYPECODE)
+
+    for (gap, tf, position_list) in block:
+        gaps.append(gap)
+        tfs.append(tf)
+        if codec == CODEC_FIXED:
+            positions.extend(position_list)
+            offsets.append(num_of_positions + len(positions))
+        else:
+            positions.extend(get_position_gaps(position_list))
+            offsets.append(len(position_list))
+
+    if codec == CODEC_FIXED:
+        return [gaps.tobytes(), tfs.tobytes(), offsets.tobytes(), \
+            positions.tobytes()]
+
+    (encode, _) = CODECS[codec]
+    return [encode(gaps), encode(tfs), encode(offsets), encode(positions)]
+
+def encode_bitmap(internal_ids, num_of_docs):
+    """
+    Encodes the internal docIDs (see `doc_lengths`) of the postings of a
+    term to the bytes of the region of its bitmap, in which bit i % 8 of
+    byte i // 8 is set if internal docID i is given. The bitmap is
+    compressed with zlib.
+    """
+    bitmap = bytearray((num_of_docs + 7) // 8)
+    for internal_id in internal_ids:
+        bitmap[internal_id >> 3] |= 1 << (internal_id & 7)
+    return zlib.compress(bytes(bitmap))
+
+def get_position_gaps(position_list):
+    """
+    Converts a sorted position list to the gaps between adjacent positions.
+    The first element is the first position itself.
+    """
+    prev_position = 0
+    for position in position_list:
+        yield position - prev_position
+        prev_position = position
+
+def write_file_header(f, codec, skip_interval=SKIP_INTERVAL):
+    """
+    Writes the header of the postings file to `f`, and returns the
+    number of bytes written.
+    """
+    f.write(FILE_HEADER.pack(MAGIC, codec, skip_interval))
+    return FILE_HEADER.size
+
+def get_file_identity(file):
+    """
+    Returns the identity of an open file, i.e. its device, inode, size and
+    modification time, which is the same for every path that the file is
+    opened through, but differs once the file is replaced or rewritten.
+    """
+    stat = os.fstat(file.fileno())
+    return (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+class PostingsFile:
+    """
+    Represents a postings file. The file is memory-mapped once, and the
+    postings lists are read from it through views.
+    """
+
+    def __init__(self, postings_file):
+        self.path = postings_file
+        self.file = open(postings_file, 'rb')
+        # Identifies the opened file, whichever path it was opened through, and
+        # changes if the file is rebuilt (see `get_file_identity`)
+        self.identity = get_file_identity(self.file)
+        self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.buffer = memoryview(self.mmap)
+
+        (magic, self.codec, self.skip_interval) = FILE_HEADER.unpack_from(self.mmap)
+        assert magic == MAGIC, 'Unknown postings file format'
+
+    def read(self, start_pointer, end_pointer):
+        """
+        Reads the postings list that starts at `start_pointer` and ends at
+        `end_pointer` (inclusive).
+        """
+        start = start_pointer + HEADER.size
+        (doc_freq, gaps_size, tfs_size, offsets_size) = \
+            HEADER.unpack_from(self.mmap, start_pointer)
+
+        # The (small) skip entries are copied, as they are read many times
+        skips = array(TYPECODE)
+        skips_size = max(doc_freq - 1, 0) // self.skip_interval * SKIP_ENTRY * \
+            skips.itemsize
+        skips.frombytes(self.buffer[start:start + skips_size])
+        start += skips_size
+
+        sections = []
+        for size in (gaps_size, tfs_size, offsets_size):
+            sections.append(self.buffer[start:start + size])
+            start += size
+        sections.append(self.buffer[start:end_pointer + 1])
+
+        if self.codec == CODEC_FIXED:
+            sections = [section.cast(TYPECODE) for section in sections]
+
+        return PostingsView(doc_freq, skips, sections, self.codec, self.skip_interval)
+
+    def read_bitmap(self, start_pointer, size):
+        """
+        Reads the bitmap of `size` bytes that starts at `start_pointer` (see
+        `encode_bitmap`), and returns its decompressed bytes.
+        """
+        return zlib.decompress(self.buffer[start_pointer:start_pointer + size])
+
+    def close(self):
+        """
+        Closes the postings file.
+
+        NOTE: All views that were read from the file must have been
+        released beforehand.
+        """
+        self.buffer.release()
+        self.mmap.close()
+        self.file.close()
+
+class PostingsView:
+    """
+    Represents a postings list that is read from the postings file. Each
+    of its sections is a view into the postings file.
+
+    The postings are split into blocks of `skip_interval` postings, which
+    can be decoded on their own (see `get_block`). With `CODEC_FIXED`, the
+    sections can also be indexed directly.
+    """
+
+    def __init__(self, doc_freq, skips, sections, codec, skip_interval):
+        (self.gaps, self.tfs, self.offsets, self.positions) = sections
+        self.skips = skips
+        self.doc_freq = doc_freq
+        self.codec = codec
+        self.skip_interval = skip_interval
+
+    def __len__(self):
+        return self.doc_freq
+
+    def __iter__(self):
+        """
+        Yields the `(gap, tf, positions)` of each posting. Compressed
+        sections are decoded block by block as they are consumed.
+        """
+        for block_index in range(self.get_block_count()):
+            yield from self.get_block(block_index)
+
+    def get_block_count(self):
+        """
+        Returns the number of blocks of the postings list.
+        """
+        if self.doc_freq == 0:
+            return 0
+        return len(self.skips) // SKIP_ENTRY + 1
+
+    def get_skip_doc_ids(self):
+        """
+        Returns the docIDs of the last postings of all blocks but the last
+        one, i.e. the docIDs that the blocks after them start after.
+        """
+        return self.skips[::SKIP_ENTRY]
+
+    def get_block(self, block_index):
+        """
+        Yields the `(gap, tf, positions)` of each posting in the block at
+        `block_index`. The gap of its first posting is relative to the last
+        posting of the block before.
+        """
+        start = block_index * self.skip_interval
+        end = min(start + self.skip_interval, self.doc_freq)
+
+        if self.codec == CODEC_FIXED:
+            for index in range(start, end):
+                yield (self.gaps[index], self.tfs[index], \
+                    self.get_positions(index))
+            return
+
+        (_, decode) = CODECS[self.codec]
+        (gaps, tfs, counts, position_gaps) = \
+            [decode(section) for section in self.get_block_sections(block_index)]
+
+        for (gap, tf, count) in zip(gaps, tfs, counts):
+            positions = array(TYPECODE)
+            position = 0
+            for _ in range(count):
+                position += next(position_gaps)
+                positions.append(position)
+            yield (gap, tf, positions)
+
+    def get_block_sections(self, block_index):
+        """
+        Returns the parts of the gaps, tfs, offsets and positions sections
+        that hold the block at `block_index`.
+        """
+        sections = (self.gaps, self.tfs, self.offsets, self.positions)
+        starts = self.get_block_offsets(block_index)
+        if block_index + 1 < self.get_block_count():
+            ends = self.get_block_offsets(block_index + 1)
+        else:
+            ends = [len(section) for section in sections]
+
+        return [section[start:end] for (section, start, end) \
+            in zip(sections, starts, ends)]
+
+    def get_block_offsets(self, block_index):
+        """
+        Returns the offsets (in bytes) at which the block at `block_index`
+        starts in the gaps, tfs, offsets and positions sections.
+        """
+        if block_index == 0:
+            return (0, 0, 0, 0)
+        skip = (block_index - 1) * SKIP_ENTRY
+        return self.skips[skip + 1:skip + SKIP_ENTRY]
+
+    def decode(self):
+        """
+        Decodes the whole postings list, and returns the
+        `(doc_ids, tfs, position_lists)` of its postings.
+
+        NOTE: The arrays that are returned are copies, so unlike the view
+        they do not refer to the postings file.
+        """
+        doc_ids = array(TYPECODE)
+        tfs = array(TYPECODE)
+        position_lists = []
+
+        doc_id = 0
+        for (gap, tf, positions) in self:
+            doc_id += gap
+            doc_ids.append(doc_id)
+            tfs.append(tf)
+            position_lists.append(array(TYPECODE, positions))
+
+        return (doc_ids, tfs, position_lists)
+
+    def get_positions(self, index):
+        """
+        Returns the positions of the posting at `index`.
+
+        NOTE: Only supported with `CODEC_FIXED`.
+        """
+        return self.positions[self.offsets[index]:self.offsets[index + 1]]
+
+class PostingsCursor:
+    """
+    Represents a cursor over the postings of a `PostingsView`, which moves
+    forward one posting at a time or skips to a docID.
+
+    Only the block that the cursor is in is decoded. When skipping, the
+    skip entries are searched for the block that the docID may be found
+    in, and the blocks in between are never decoded.
+    """
+
+    def __init__(self, view):
+        self.view = view
+        self.skip_doc_ids = view.get_skip_doc_ids()
+        self.num_of_blocks = view.get_block_count()
+        self.block_index = -1
+        self.block = []
+        self.index = 0
+        if self.num_of_blocks > 0:
+            self.load_block(0)
+
+    def load_block(self, block_index):
+        """
+        Decodes the block at `block_index`, and moves to its first posting.
+        """
+        if block_index == 0:
+            doc_id = 0
+        else:
+            doc_id = self.skip_doc_ids[block_index - 1]
+
+        # Like `PostingsView.decode`, the positions are copied
+        self.block = []
+        for (gap, tf, positions) in self.view.get_block(block_index):
+            doc_id += gap
+            self.block.append((doc_id, tf, array(TYPECODE, positions)))
+        self.block_index = block_index
+        self.index = 0
+
+    def is_done(self):
+        return self.index >= len(self.block)
+
+    def get_doc_id(self):
+        return self.block[self.index][0]
+
+    def get_posting(self):
+        """
+        Returns the `(doc_id, tf, positions)` of the current posting.
+        """
+        return self.block[self.index]
+
+    def next(self):
+        """
+        Moves to the next posting.
+        """
+        self.index += 1
+        if self.index == len(self.block) and self.block_index + 1 < self.num_of_blocks:
+            self.load_block(self.block_index + 1)
+
+    def skip_to(self, doc_id):
+        """
+        Moves to the first posting whose docID is at least `doc_id`.
+        """
+        if self.is_done() or self.get_doc_id() >= doc_id:
+            return
+
+        # Blocks whose last docID is smaller than `doc_id` are skipped
+        block_index = bisect_left(self.skip_doc_ids, doc_id)
+        if block_index > self.block_index:
+            self.load_block(block_index)
+
+        while not self.is_done() and self.get_doc_id() < doc_id:
+            self.next()
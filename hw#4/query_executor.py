@@ -0,0 +1,160 @@
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from search_engine import SearchEngine
+from query_expansion import load_wordnet
+
+"""
+Maximum number of queries that are submitted to each worker but not yet
+consumed, so that queries are streamed through the pool.
+"""
+MAX_PENDING_QUERIES_PER_WORKER = 4
+
+"""
+The index of a worker process, which is inherited from the parent when the
+worker is forked.
+"""
+worker_index = None
+
+def run_query(search_index, query):
+    """
+    Runs the query with a new `SearchEngine` over search_index, and returns
+    its `(result, scores)`. A blank query has no results.
+    """
+    if query.strip() == "":
+        return ([], {})
+
+    engine = SearchEngine(search_index)
+    return engine.run_query(query)
+
+def run_timed_query(search_index, query):
+    """
+    Runs the query like `run_query` does, and returns its
+    `(result, scores, run_time)`, where `run_time` is in seconds.
+    """
+    start_time = time.perf_counter()
+    (result, scores) = run_query(search_index, query)
+    return (result, scores, time.perf_counter() - start_time)
+
+def init_worker(search_index):
+    """
+    Initializes a worker process with the index of its parent.
+    """
+    global worker_index
+    worker_index = search_index
+
+def run_query_in_worker(query, is_timed=False):
+    """
+    Runs the query in a worker process.
+    """
+    if is_timed:
+        return run_timed_query(worker_index, query)
+    return run_query(worker_index, query)
+
+def wait_for(query_and_future):
+    """
+    Waits for the query of `(query, future)` to be done, and returns it.
+    """
+    (_, future) = query_and_future
+    # Wait without raising, a failing query is reported by its future
+    future.exception()
+    return query_and_future
+
+class QueryExecutor:
+    """
+    Represents an executor that runs queries over a shared `SearchIndex`
+    with a pool of `num_workers` workers, and measures the throughput.
+
+    By default, the workers are threads, which suits queries that mostly
+    wait for the postings to be read from disk. Otherwise, the workers are
+    forked processes, which suits CPU-bound scoring. As they are forked,
+    the processes share the memory-mapped files of the index with the
+    parent instead of loading the index again.
+
+    NOTE: Processes are only supported on platforms that can fork.
+    """
+
+    def __init__(self, search_index, num_workers=1, use_processes=False):
+        self.search_index = search_index
+        self.num_workers = num_workers
+        self.num_of_queries = 0
+        self.elapsed_time = 0
+
+        # Load WordNet before any worker uses it, which also shares it with forked workers,
+        # unless query expansion mostly looks up the precomputed expansions
+        if search_index.expansion_table is None:
+            load_wordnet()
+
+        if use_processes:
+            self.pool = ProcessPoolExecutor(num_workers, \
+                mp_context=multiprocessing.get_context("fork"), \
+                initializer=init_worker, initargs=(search_index,))
+        else:
+            self.pool = ThreadPoolExecutor(num_workers)
+
+    def run_queries(self, queries):
+        """
+        Runs the queries, and yields `(query, future)` for each query once
+        it is done, in the same order as the queries. The result of the
+        future is the `(result, scores)` of the query.
+
+        The queries are read lazily, and only a bounded number of queries
+        are submitted ahead of the consumer.
+        """
+        elapsed_time = self.elapsed_time
+        start_time = time.perf_counter()
+
+        for (query, future) in self.run_queries_in_order(queries):
+            self.num_of_queries += 1
+            self.elapsed_time = elapsed_time + time.perf_counter() - start_time
+            yield (query, future)
+
+    def run_queries_in_order(self, queries):
+        """
+        Runs the queries, and yields `(query, future)` for each query once
+        it is done, in the same order as the queries.
+        """
+        max_pending_queries = self.num_workers * MAX_PENDING_QUERIES_PER_WORKER
+        pending_queries = deque()
+        for query in queries:
+            pending_queries.append((query, self.submit(query)))
+            # Backpressure: wait for the oldest query before reading more queries
+            if len(pending_queries) >= max_pending_queries:
+                yield wait_for(pending_queries.popleft())
+
+        while pending_queries:
+            yield wait_for(pending_queries.popleft())
+
+    def submit(self, query, is_timed=False):
+        """
+        Submits the query to the pool, and returns its future. The result
+        of the future is the `(result, scores)` of the query, or its
+        `(result, scores, run_time)` if `is_timed` is set.
+
+        NOTE: Queries that are submitted directly are not counted in the
+        stats.
+        """
+        if isinstance(self.pool, ProcessPoolExecutor):
+            return self.pool.submit(run_query_in_worker, query, is_timed)
+        if is_timed:
+            return self.pool.submit(run_timed_query, self.search_index, query)
+        return self.pool.submit(run_query, self.search_index, query)
+
+    def get_stats(self):
+        """
+        Returns the number of queries run, the (wall-clock) time spent
+        running them and the throughput, in queries per second.
+        """
+        return {
+            'queries': self.num_of_queries,
+            'elapsed_time': self.elapsed_time,
+            'throughput': self.num_of_queries / self.elapsed_time if self.elapsed_time > 0 else 0
+        }
+
+    def close(self):
+        """
+        Shuts down the pool, after the queries that were submitted are done.
+        """
+        self.pool.shutdown()
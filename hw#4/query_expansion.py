@@ -1,28 +1,126 @@
-from nltk.corpus import wordnet as wn
+import pickle
+import threading
+
 from tokenizer import tokenize_word_enhanced
+from query_util import is_phrase
+
+"""
+Maximum number of expanded terms of a query term.
+"""
+MAX_EXPANDED_TERMS = 2
 
-def query_expansion(term, dictionary):
+# WordNet, which is only imported and loaded on first use (see `load_wordnet`)
+wordnet = None
+wordnet_lock = threading.Lock()
+
+def load_wordnet():
+    """
+    Loads WordNet if it has not been loaded yet, and returns it.
+
+    NOTE: nltk is only imported here, as importing it takes long, and queries
+    whose terms are all covered by an `ExpansionTable` never need WordNet.
+    Loading WordNet is not thread-safe in nltk, so it is loaded under a lock.
+    """
+    global wordnet
+    if wordnet is not None:
+        return wordnet
+
+    with wordnet_lock:
+        if wordnet is None:
+            from nltk.corpus import wordnet as wn
+            # Accessing the corpus makes nltk load it
+            wn.get_version()
+            wordnet = wn
+        return wordnet
+
+def query_expansion(term, dictionary, expansion_table=None):
     """
     input type = str
     retrieve the term with highest weight, insert into
     this function and find its expanded query terms
+
+    The expanded terms of the terms covered by `expansion_table` (see
+    `ExpansionTable`) are looked up in it, and the other terms are expanded
+    with WordNet.
+    """
+    if expansion_table is not None and term in expansion_table:
+        return expansion_table.get_expanded_terms(term)
+    return find_expanded_terms(term, dictionary)
+
+def find_expanded_terms(term, dictionary):
+    """
+    Returns the (at most MAX_EXPANDED_TERMS) expanded terms of a term,
+    i.e. its synonyms in WordNet that are in the dictionary, stemmed the
+    same way as the indexed terms.
     """
-    word_net = wn.synsets(term)
+    word_net = load_wordnet().synsets(term)
     expanded_terms = []
+    seen_terms = set()
     for net in word_net:
         lemma_terms = net.lemma_names()
         for lemma_term in lemma_terms:
             lemma_term = tokenize_word_enhanced(lemma_term)
-            if lemma_term not in expanded_terms:
+            if lemma_term not in seen_terms:
+                seen_terms.add(lemma_term)
                 expanded_terms.append(lemma_term)
 
     # examine whether the new term is in the dictionary
     return_terms = []
     for expanded_term in expanded_terms:
-        if expanded_term in dictionary.keys() and expanded_term != term:
+        if expanded_term in dictionary and expanded_term != term:
             return_terms.append(expanded_term)
+            if len(return_terms) == MAX_EXPANDED_TERMS:
+                break
+
+    return return_terms
+
+def build_expansion_table(dictionary):
+    """
+    Returns the expanded terms of every term (but not phrase) in the
+    dictionary, as a dictionary from term to a tuple of its expanded terms.
+    Terms without any expanded terms are left out.
+
+    NOTE: This looks up every term in WordNet, so it is only run while
+    indexing.
+    """
+    expansions = {}
+    for term in dictionary:
+        if is_phrase(term):
+            continue
+        expanded_terms = find_expanded_terms(term, dictionary)
+        if expanded_terms:
+            expansions[term] = tuple(expanded_terms)
+    return expansions
+
+def write_expansion_table(expansions, expansions_file):
+    """
+    Writes the expanded terms built by `build_expansion_table` to
+    expansions_file.
+    """
+    with open(expansions_file, 'wb') as f:
+        pickle.dump(expansions, f)
+
+class ExpansionTable:
+    """
+    Represents the expanded terms of the terms in the dictionary, which are
+    precomputed while indexing (see `build_expansion_table`), so that query
+    expansion does not look up WordNet for any known term.
+
+    Every term in the dictionary is covered by the table, including the
+    ones that have no expanded terms and are not stored in the file. Query
+    terms that are not in the dictionary are still expanded with WordNet.
+    """
+
+    def __init__(self, expansions_file, dictionary):
+        with open(expansions_file, 'rb') as f:
+            self.expansions = pickle.load(f)
+        self.dictionary = dictionary
+
+    def __contains__(self, term):
+        return term in self.dictionary and not is_phrase(term)
 
-    if len(return_terms) >= 2:
-        return return_terms[:2]
-    else:
-        return return_terms
\ No newline at end of file
+    def get_expanded_terms(self, term):
+        """
+        Returns the expanded terms of a term that is covered by the table.
+        """
+        return self.expansions.get(term, ())
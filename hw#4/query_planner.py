@@ -0,0 +1,112 @@
+from io_util import load_term_info
+from query_util import is_phrase
+
+def estimate_term_doc_freq(term, dictionary):
+    """
+    Returns the document frequency of a single term, or 0 if it does not
+    exist.
+    """
+    term_info = load_term_info(term, dictionary)
+    if term_info is None:
+        return 0
+    return term_info.doc_freq
+
+def estimate_phrase_doc_freq(phrase, dictionary):
+    """
+    Returns an upper bound on the number of documents that contain the
+    phrase, i.e. the minimum document frequency of its words, or of the
+    biword of its first two words if it is in the index.
+    """
+    phrase_words = phrase.split()
+    doc_freqs = [estimate_term_doc_freq(phrase_word, dictionary) for phrase_word in phrase_words]
+
+    biword_info = load_term_info(" ".join(phrase_words[:2]), dictionary)
+    if biword_info is not None:
+        doc_freqs.append(biword_info.doc_freq)
+
+    return min(doc_freqs)
+
+def estimate_clause_size(or_terms, dictionary, num_of_docs):
+    """
+    Returns an estimate of the number of documents that match a clause of
+    a boolean query, i.e. a group of terms (or phrases) that are ORed.
+
+    The estimate of a group is the sum of the estimates of its terms, which
+    is bounded by the number of documents. An estimate is never smaller
+    than the actual number of documents, so a clause whose estimate is 0
+    matches no documents.
+    """
+    size = 0
+    for term in or_terms:
+        if is_phrase(term):
+            size += estimate_phrase_doc_freq(term, dictionary)
+        else:
+            size += estimate_term_doc_freq(term, dictionary)
+    return min(size, num_of_docs)
+
+def plan_boolean_query(query_terms, dictionary, num_of_docs):
+    """
+    Returns the `QueryPlan` of a boolean query, given as its clauses (see
+    `estimate_clause_size`).
+
+    NOTE: The clauses are ANDed, so once a clause cannot match any document,
+    neither can the query, and the plan is short-circuited on that clause
+    without estimating the remaining ones.
+    """
+    clauses = []
+    for or_terms in query_terms:
+        size = estimate_clause_size(or_terms, dictionary, num_of_docs)
+        if size == 0:
+            return QueryPlan([], empty_clause=or_terms)
+        clauses.append((or_terms, size))
+
+    # Clauses with the same estimate keep their order in the query
+    clauses.sort(key=lambda clause: clause[1])
+    return QueryPlan(clauses)
+
+class QueryPlan:
+    """
+    Represents the plan of a boolean query, i.e. the order in which the
+    posting lists of its clauses are intersected.
+
+    The clauses are ordered by their estimated number of documents, from
+    the smallest one up, so that the intermediate results stay as small as
+    possible and the large posting lists are intersected with short ones,
+    which the intersection methods are fastest at (see
+    `query_util.find_matches`).
+
+    If a clause cannot match any document (e.g. a term that is not in the
+    dictionary), the plan is short-circuited: it has no clauses to evaluate,
+    as the query matches no documents, and the clause is kept in
+    empty_clause instead.
+
+    NOTE: The estimates are only based on the dictionary, as the plan is
+    made before any posting list of the query is loaded.
+    """
+
+    def __init__(self, clauses, empty_clause=None):
+        # (or_terms, estimated_size) of each clause, in the order of evaluation
+        self.clauses = clauses
+        # Clause that the plan was short-circuited on, if any
+        self.empty_clause = empty_clause
+
+    def is_short_circuited(self):
+        """
+        Returns True if the query cannot match any document, i.e. no clause
+        has to be evaluated.
+        """
+        return self.empty_clause is not None
+
+    def get_clauses(self):
+        """
+        Returns the clauses (groups of OR terms) in the order of evaluation.
+        """
+        return [or_terms for (or_terms, _) in self.clauses]
+
+    def __str__(self):
+        if self.is_short_circuited():
+            return "short-circuited: {} (no docs)".format(" OR ".join(self.empty_clause))
+        lines = []
+        for (i, (or_terms, size)) in enumerate(self.clauses):
+            lines.append("{}. {} (~{} docs)".format(i + 1, " OR ".join(or_terms), size))
+        return "\n".join(lines)
@@ -1,4 +1,24 @@
+import sys
+from bisect import bisect_left
 from math import log10, sqrt
+from operator import itemgetter
+
+"""
+Thresholds that choose how two posting lists are intersected (see
+`get_match_method`), as measured by benchmark_intersect.py. Lists whose
+lengths differ by at least `GALLOP_RATIO` times are intersected by galloping
+search, and lists of at most `LINEAR_MAX_LEN` docIDs by a linear merge.
+Other lists are intersected by a hash probe.
+"""
+GALLOP_RATIO = 32
+LINEAR_MAX_LEN = 16
+
+"""
+Indices of the set bits of every byte (see `union_bitmaps`), and the number
+of set bits of every byte.
+"""
+BYTE_BITS = [tuple(bit for bit in range(8) if (byte >> bit) & 1) for byte in range(256)]
+BIT_COUNTS = [len(bits) for bits in BYTE_BITS]
 
 def calculate_weighted_tf(tf):
     """
@@ -27,69 +47,552 @@ def calculate_weight(tf, N, df):
     idf = calculate_idf(N, df)
     return weighted_tf * idf
 
+def calculate_doc_weight(term, doc_info, phrase_weight):
+    """
+    Returns the weight of the given term (which can be a phrase) in a
+    document, where `doc_info` holds the `(tf, positions)` of the terms in
+    the document (see `TermInfos`).
+
+    For a phrase, the weighted tf of each word in the phrase is summed up,
+    where the tf of each word is adjusted towards the tf of the phrase
+    according to `phrase_weight`.
+    """
+    term_freq = doc_info.get_tf(term)
+    
+    phrase_words = term.split()
+    doc_weight = 0
+
+    for phrase_word in phrase_words:
+        # Term freq refers to the tf of the phrase
+        # Phrase word tf referts to the tf of one word within the phrase
+        if phrase_word == term:
+            phrase_word_tf = term_freq
+        else:
+            phrase_word_tf = doc_info.get_tf(phrase_word)
+        adjusted_tf = term_freq + (phrase_word_tf - term_freq) * (1 - phrase_weight)
+        doc_weight += calculate_weighted_tf(adjusted_tf)
+
+    return doc_weight
+
+def get_doc_weight(term, posting_list, index, phrase_weight):
+    """
+    Returns the weight of the given term (which can be a phrase) in the
+    document of the posting at `index` of a posting list (see
+    `calculate_doc_weight`).
+
+    In the `PostingList` of the term itself, the adjusted tf of the term is
+    its tf, so the weight is found without building the doc info.
+    """
+    if isinstance(posting_list, PostingList) and posting_list.term == term:
+        return calculate_weighted_tf(posting_list.tfs[index])
+    return calculate_doc_weight(term, posting_list[index][1], phrase_weight)
+
+def get_doc_weights(term, posting_list, phrase_weight):
+    """
+    Returns an iterator over the `(doc_id, doc_weight)` of each posting of a
+    posting list, where `doc_weight` is the weight of the given term (see
+    `get_doc_weight`).
+    """
+    if isinstance(posting_list, PostingList) and posting_list.term == term:
+        return zip(posting_list.doc_ids, map(calculate_weighted_tf, posting_list.tfs))
+    return ((doc_id, calculate_doc_weight(term, doc_info, phrase_weight)) \
+        for (doc_id, doc_info) in posting_list)
+
 def intersect(list1, list2, curr_term=None, prev_term=None, is_strict=True):
     """
     Returns the intersection of two posting lists.
 
     If `curr_term` and `prev_term` are specified, the position list will be matched as well.
+
+    Each posting list is either a list of doc infos (or a `PostingList`) or a
+    cursor over them (see `ListCursor`). Two lists are intersected by the
+    method that suits their lengths best (see `find_matches`), while a cursor
+    skips ahead to the docID of the other posting list whenever it is behind.
+
+    The intersection of two bitmaps (see `PostingBitmap`) is a bitmap as
+    well, unless positions are matched, so that a chain of intersections
+    keeps intersecting bitmaps a machine word at a time.
+
+    NOTE: The doc infos of the posting lists are never modified, as they may
+    be cached (see `merge_doc_info`). A doc that contains the phrase is added
+    twice, once for the phrase and once for its words, and both postings
+    share the same merged doc info.
+    """
+    result = []
+
+    for (doc_info1, doc_info2) in find_matching_doc_infos(list1, list2):
+        doc1 = get_doc_id(doc_info1)
+        doc_info = merge_doc_info(doc_info1, doc_info2)
+
+        # For phrase queries
+        if prev_term is not None:
+            prev_positions = doc_info1[1][prev_term][1]
+            curr_positions = doc_info2[1][curr_term][1]
+            new_phrase = " ".join([prev_term, curr_term])
+            prev_len = len(prev_term.split())
+            (phrase_tf, phrase_pos) = get_token_info_for_phrase(prev_len, prev_positions, curr_positions)
+            if phrase_tf != 0:
+                phrase_info = get_doc_info(new_phrase, doc1, phrase_tf, phrase_pos)
+                doc_info = merge_doc_info(doc_info, phrase_info)
+                result.append(doc_info)
+
+                if is_strict:
+                    result.append(doc_info)
+            
+            if not is_strict:
+                result.append(doc_info)
+        else:
+            result.append(doc_info)
+
+    if prev_term is None and is_bitmap(list1) and is_bitmap(list2):
+        return DocInfoBitmap(result, list1.bitmap.intersection(list2.bitmap), list1.lengths)
+    return result
+
+def find_matching_doc_infos(list1, list2):
     """
+    Yields the pairs of doc infos of two posting lists (or cursors over
+    them) that have the same docID, in order.
+
+    The common docs of two bitmaps are found a machine word at a time (see
+    `match_bitmaps`), and the docs of a posting list are looked up in a
+    bitmap by their bits (see `match_bitmap_list`).
+    """
+    if is_bitmap(list1) and is_bitmap(list2):
+        for (i, j) in match_bitmaps(list1.bitmap, list2.bitmap):
+            yield (list1[i], list2[j])
+        return
+
+    if is_bitmap(list1) and is_posting_list(list2):
+        for (i, j) in match_bitmap_list(list1, get_doc_ids(list2)):
+            yield (list1[i], list2[j])
+        return
+
+    if is_posting_list(list1) and is_bitmap(list2):
+        for (j, i) in match_bitmap_list(list2, get_doc_ids(list1)):
+            yield (list1[i], list2[j])
+        return
+
+    if is_posting_list(list1) and is_posting_list(list2):
+        for (i, j) in find_matches(get_doc_ids(list1), get_doc_ids(list2)):
+            yield (list1[i], list2[j])
+        return
+
+    cursor1 = get_cursor(list1)
+    cursor2 = get_cursor(list2)
+
+    while not cursor1.is_done() and not cursor2.is_done():
+        doc1 = cursor1.get_doc_id()
+        doc2 = cursor2.get_doc_id()
+
+        if doc1 == doc2:
+            yield (cursor1.get_doc_info(), cursor2.get_doc_info())
+            cursor1.next()
+            cursor2.next()
+        elif doc1 < doc2:
+            cursor1.skip_to(doc2)
+        else:
+            cursor2.skip_to(doc1)
+
+def match_bitmaps(bitmap1, bitmap2):
+    """
+    Returns the `(i, j)` pairs of indices of the postings of two bitmaps (see
+    `Bitmap`) that have the same doc, in order.
+
+    The common docs are found by ANDing the bitmaps. The index of a doc in
+    either posting list is the number of set bits before its own, which is
+    counted byte by byte along the way.
+    """
+    common_bytes = get_bytes(bitmap1.bits & bitmap2.bits, len(bitmap1.bytes))
+
     result = []
     i = 0
     j = 0
+    for (byte, byte1, byte2) in zip(common_bytes, bitmap1.bytes, bitmap2.bytes):
+        if byte:
+            for bit in BYTE_BITS[byte]:
+                lower_bits = (1 << bit) - 1
+                result.append((i + BIT_COUNTS[byte1 & lower_bits], \
+                    j + BIT_COUNTS[byte2 & lower_bits]))
+        i += BIT_COUNTS[byte1]
+        j += BIT_COUNTS[byte2]
 
-    len1 = len(list1)
-    len2 = len(list2)
+    return result
 
-    skip_len1 = int(sqrt(len1))
-    skip_len2 = int(sqrt(len2))
+def match_bitmap_list(posting_bitmap, doc_ids):
+    """
+    Returns the `(i, j)` pairs of indices at which a bitmap (see
+    `PostingBitmap`) and a sorted list of docIDs hold the same doc, in
+    order.
+
+    Each docID is looked up in the bitmap by the bit of its internal docID.
+    Its index in the bitmap is the number of set bits before that bit, which
+    is counted as the docIDs are visited in order, by counting the set bits
+    of the bytes in between at once. As in `find_matches`, only the first
+    occurrence of a docID in the list is matched.
+    """
+    all_doc_ids = posting_bitmap.lengths.doc_ids
+    bitmap_bytes = posting_bitmap.bitmap.bytes
+
+    result = []
+    # The set bits before byte_index have been counted
+    byte_index = 0
+    count = 0
+    prev_i = -1
+    # The docIDs are sorted, so each one is searched for from the previous one on
+    internal_id = 0
+    for (j, doc_id) in enumerate(doc_ids):
+        internal_id = bisect_left(all_doc_ids, doc_id, internal_id)
+        index = internal_id >> 3
+        byte = bitmap_bytes[index]
+        bit = 1 << (internal_id & 7)
+        if not byte & bit:
+            continue
+
+        if index > byte_index:
+            count += count_set_bits(bitmap_bytes[byte_index:index])
+            byte_index = index
+
+        i = count + BIT_COUNTS[byte & (bit - 1)]
+        if i != prev_i:
+            result.append((i, j))
+            prev_i = i
+
+    return result
+
+def find_matches(doc_ids1, doc_ids2):
+    """
+    Returns the `(i, j)` pairs of indices at which two sorted lists of
+    docIDs hold the same docID, in order.
+
+    As in a linear merge, the k-th occurrence of a docID in one list is
+    matched with its k-th occurrence in the other list.
+    """
+    if len(doc_ids1) > len(doc_ids2):
+        return [(i, j) for (j, i) in find_matches(doc_ids2, doc_ids1)]
+
+    match = get_match_method(len(doc_ids1), len(doc_ids2))
+    return match(doc_ids1, doc_ids2)
+
+def get_match_method(short_len, long_len):
+    """
+    Returns the method that intersects a list of `short_len` docIDs with a
+    list of `long_len` docIDs the fastest.
+
+    A linear merge steps through both lists in Python, so it only wins for
+    short lists. A hash probe scans the longer list in C instead, which is
+    faster until the longer list is so much longer that searching it for
+    each docID of the shorter list (galloping search) takes less time.
+    """
+    if long_len >= GALLOP_RATIO * short_len:
+        return gallop_match
+    if long_len <= LINEAR_MAX_LEN:
+        return linear_match
+    return hash_match
+
+def linear_match(short_doc_ids, long_doc_ids):
+    """
+    Matches two lists of docIDs (see `find_matches`) by a linear merge.
+    """
+    result = []
+    i = 0
+    j = 0
+
+    len1 = len(short_doc_ids)
+    len2 = len(long_doc_ids)
 
     while i < len1 and j < len2:
-        doc1 = get_doc_id(list1[i])
-        doc2 = get_doc_id(list2[j])
+        doc1 = short_doc_ids[i]
+        doc2 = long_doc_ids[j]
 
         if doc1 == doc2:
-            # For phrase queries
-            if prev_term is not None:
-                prev_positions = list1[i][1][prev_term][1]
-                curr_positions = list2[j][1][curr_term][1]
-                new_phrase = " ".join([prev_term, curr_term])
-                prev_len = len(prev_term.split())
-                (phrase_tf, phrase_pos) = get_token_info_for_phrase(prev_len, prev_positions, curr_positions)
-                phrase_info = [doc1, {
-                    new_phrase: (phrase_tf, phrase_pos)
-                }]
-                if phrase_tf != 0:
-                    result.append(merge_doc_info(list1[i], phrase_info))
-
-                    if is_strict:
-                        result.append(merge_doc_info(list1[i], list2[j]))
-                
-                if not is_strict:
-                    result.append(merge_doc_info(list1[i], list2[j]))
-            else:
-                result.append(merge_doc_info(list1[i], list2[j]))
-            
+            result.append((i, j))
             i += 1
             j += 1
         elif doc1 < doc2:
-            skip_ptr = get_skip_pointer(len1, skip_len1, i)
-            if skip_ptr is not None and get_doc_id(list1[skip_ptr]) <= doc2:
-                i = skip_ptr
-            else:
-                i += 1
+            i += 1
         else:
-            skip_ptr = get_skip_pointer(len2, skip_len2, j)
-            if skip_ptr is not None and get_doc_id(list2[skip_ptr]) <= doc1:
-                j = skip_ptr
-            else:
-                j += 1
-    
+            j += 1
+
+    return result
+
+def gallop_match(short_doc_ids, long_doc_ids):
+    """
+    Matches two lists of docIDs (see `find_matches`) by galloping search:
+    for each docID of the shorter list, the longer list is probed at steps
+    that double in size from the last match, and the range that the docID
+    falls in is then binary searched.
+    """
+    result = []
+    lo = 0
+    len2 = len(long_doc_ids)
+
+    for (i, doc_id) in enumerate(short_doc_ids):
+        hi = lo
+        step = 1
+        while hi < len2 and long_doc_ids[hi] < doc_id:
+            lo = hi + 1
+            hi = lo + step
+            step *= 2
+
+        j = bisect_left(long_doc_ids, doc_id, lo, min(hi, len2))
+        if j == len2:
+            break
+        if long_doc_ids[j] == doc_id:
+            result.append((i, j))
+            lo = j + 1
+        else:
+            lo = j
+
+    return result
+
+def hash_match(short_doc_ids, long_doc_ids):
+    """
+    Matches two lists of docIDs (see `find_matches`) by a hash probe: the
+    longer list is scanned once, and each of its docIDs is looked up in a
+    hash table of the first index of each docID in the shorter list.
+    """
+    short_doc_ids = list(short_doc_ids)
+    first_indices = {}
+    for (i, doc_id) in enumerate(short_doc_ids):
+        first_indices.setdefault(doc_id, i)
+
+    hits = [(j, doc_id) for (j, doc_id) in enumerate(long_doc_ids) \
+        if doc_id in first_indices]
+
+    result = []
+    prev_doc_id = None
+    occurrence = 0
+    for (j, doc_id) in hits:
+        occurrence = occurrence + 1 if doc_id == prev_doc_id else 0
+        prev_doc_id = doc_id
+
+        # The k-th occurrences of a docID are matched
+        i = first_indices[doc_id] + occurrence
+        if i < len(short_doc_ids) and short_doc_ids[i] == doc_id:
+            result.append((i, j))
+
     return result
 
+class DocIds:
+    """
+    Represents the docIDs of a posting list, without copying them.
+    """
+
+    def __init__(self, posting_list):
+        self.posting_list = posting_list
+
+    def __len__(self):
+        return len(self.posting_list)
+
+    def __getitem__(self, index):
+        return get_doc_id(self.posting_list[index])
+
+    def __iter__(self):
+        return map(itemgetter(0), self.posting_list)
+
+def is_posting_list(posting_list):
+    """
+    Returns True if the posting list is held in memory, i.e. it is not a
+    cursor.
+    """
+    return isinstance(posting_list, (list, PostingList))
+
+def get_doc_ids(posting_list):
+    """
+    Returns the docIDs of a posting list that is held in memory, without
+    copying them.
+    """
+    if isinstance(posting_list, PostingList):
+        return posting_list.doc_ids
+    return DocIds(posting_list)
+
+def get_cursor(posting_list):
+    """
+    Returns a cursor over a posting list, which may already be a cursor.
+    """
+    if is_posting_list(posting_list):
+        return ListCursor(posting_list)
+    return posting_list
+
+class PostingList:
+    """
+    Represents the posting list of a single term as parallel arrays of the
+    docIDs, tfs and position lists of its postings, i.e. its decoded
+    postings (see `io_util.load_postings`).
+
+    Like a list of doc infos, it can be indexed and iterated over, but the
+    doc info of each posting is only built when it is accessed, so that
+    postings that are only scored, skipped over or left out of an
+    intersection never get a dict of their own.
+
+    NOTE: The arrays are shared through `io_util.posting_list_cache`, so
+    they are never modified.
+    """
+
+    def __init__(self, term, postings):
+        self.term = term
+        (self.doc_ids, self.tfs, self.position_lists) = postings
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def __getitem__(self, index):
+        return get_doc_info(self.term, self.doc_ids[index], self.tfs[index], \
+            self.position_lists[index])
+
+    def __iter__(self):
+        for index in range(len(self.doc_ids)):
+            yield self[index]
+
+class Bitmap:
+    """
+    Represents a set of internal docIDs (see `DocLengths`) as a bitmap, in
+    which bit i % 8 of byte i // 8 is set if internal docID i is in the set
+    (see `postings_file.encode_bitmap`).
+
+    The bitmap is kept both as an int, so that two bitmaps are intersected
+    and unioned a machine word at a time, and as bytes, so that single bits
+    are looked up without shifting the whole int.
+    """
+
+    def __init__(self, bitmap_bytes):
+        self.bytes = bitmap_bytes
+        self.bits = int.from_bytes(bitmap_bytes, 'little')
+
+    def intersection(self, other):
+        return Bitmap(get_bytes(self.bits & other.bits, len(self.bytes)))
+
+    def union(self, other):
+        return Bitmap(get_bytes(self.bits | other.bits, len(self.bytes)))
+
+    def get_size(self):
+        """
+        Returns the approximate number of bytes taken up by the bitmap.
+        """
+        return sys.getsizeof(self.bytes) + sys.getsizeof(self.bits)
+
+class PostingBitmap(PostingList):
+    """
+    Represents the posting list of a frequent term as a `Bitmap` of the
+    internal docIDs of its postings, besides the arrays of its `PostingList`.
+    The k-th set bit of the bitmap is the k-th posting.
+
+    The bitmaps of two terms are intersected and unioned a machine word at a
+    time, and a posting list is intersected with a bitmap by looking up its
+    docs in the bitmap (see `intersect` and `union`). Both results are
+    `DocInfoBitmap`s when both posting lists are bitmaps.
+    """
+
+    def __init__(self, term, postings, bitmap, lengths):
+        super().__init__(term, postings)
+        self.bitmap = bitmap
+        # Maps docIDs to internal docIDs
+        self.lengths = lengths
+
+class DocInfoBitmap(list):
+    """
+    Represents a list of doc infos together with the `Bitmap` of the internal
+    docIDs of its docs, e.g. the intersection or union of two bitmaps (see
+    `PostingBitmap`), so that it is still intersected and unioned as a bitmap.
+    """
+
+    def __init__(self, doc_infos, bitmap, lengths):
+        super().__init__(doc_infos)
+        self.bitmap = bitmap
+        self.lengths = lengths
+
+def is_bitmap(posting_list):
+    """
+    Returns True if the posting list is a bitmap (see `PostingBitmap`).
+    """
+    return isinstance(posting_list, (PostingBitmap, DocInfoBitmap))
+
+class ListCursor:
+    """
+    Represents a cursor over a posting list that is held in memory.
+
+    Skip pointers are placed every sqrt(n) doc infos, and are followed as
+    long as they do not overshoot the docID that is skipped to.
+    """
+
+    def __init__(self, posting_list):
+        self.posting_list = posting_list
+        self.doc_ids = get_doc_ids(posting_list)
+        self.skip_len = int(sqrt(len(posting_list)))
+        self.index = 0
+
+    def is_done(self):
+        return self.index >= len(self.posting_list)
+
+    def get_doc_id(self):
+        return self.doc_ids[self.index]
+
+    def get_doc_info(self):
+        return self.posting_list[self.index]
+
+    def next(self):
+        self.index += 1
+
+    def skip_to(self, doc_id):
+        """
+        Moves to the first doc info whose docID is at least `doc_id`.
+        """
+        if self.skip_len > 1:
+            skip_ptr = (self.index // self.skip_len + 1) * self.skip_len
+            while skip_ptr < len(self.posting_list) and self.doc_ids[skip_ptr] < doc_id:
+                self.index = skip_ptr
+                skip_ptr += self.skip_len
+
+        while not self.is_done() and self.get_doc_id() < doc_id:
+            self.index += 1
+
+class TermPostingsCursor:
+    """
+    Represents a cursor over the doc infos of a term, whose postings are
+    read from the postings file by a `postings_file.PostingsCursor`, which
+    skips over the blocks of postings without decoding them.
+    """
+
+    def __init__(self, term, postings_cursor):
+        self.term = term
+        self.postings_cursor = postings_cursor
+
+    def is_done(self):
+        return self.postings_cursor.is_done()
+
+    def get_doc_id(self):
+        return self.postings_cursor.get_doc_id()
+
+    def get_doc_info(self):
+        (doc_id, tf, positions) = self.postings_cursor.get_posting()
+        return get_doc_info(self.term, doc_id, tf, positions)
+
+    def next(self):
+        self.postings_cursor.next()
+
+    def skip_to(self, doc_id):
+        self.postings_cursor.skip_to(doc_id)
+
+def find_common_doc_ids(doc_ids1, doc_ids2):
+    """
+    Returns the sorted docIDs that are found in both sorted lists of docIDs.
+    """
+    return [doc_ids1[i] for (i, _) in find_matches(doc_ids1, doc_ids2)]
+
 def union(list1, list2):
     """
     Returns the union of two posting lists.
+
+    The union of two bitmaps (see `PostingBitmap`) is found a machine word at
+    a time, and is a bitmap as well.
     """
+    if is_bitmap(list1) and is_bitmap(list2):
+        return union_bitmaps(list1, list2)
+
+    # Doc infos are only taken from the posting lists as they are added
+    doc_ids1 = get_doc_ids(list1)
+    doc_ids2 = get_doc_ids(list2)
+
     result = []
     i = 0
     j = 0
@@ -98,8 +601,8 @@ def union(list1, list2):
     len2 = len(list2)
 
     while i < len1 and j < len2:
-        doc1 = get_doc_id(list1[i])
-        doc2 = get_doc_id(list2[j])
+        doc1 = doc_ids1[i]
+        doc2 = doc_ids2[j]
 
         if doc1 == doc2:
             result.append(merge_doc_info(list1[i], list2[j]))
@@ -122,6 +625,34 @@ def union(list1, list2):
 
     return result
 
+def union_bitmaps(bitmap1, bitmap2):
+    """
+    Returns the union of two posting lists that are bitmaps, as a bitmap.
+
+    As every posting of both bitmaps is visited in order, the k-th set bit
+    of a bitmap is simply its k-th posting.
+    """
+    bitmap = bitmap1.bitmap.union(bitmap2.bitmap)
+    bitmap_bytes = [bitmap.bytes, bitmap1.bitmap.bytes, bitmap2.bitmap.bytes]
+
+    result = []
+    i = 0
+    j = 0
+    for (byte, byte1, byte2) in zip(*bitmap_bytes):
+        for bit in BYTE_BITS[byte]:
+            if not (byte2 >> bit) & 1:
+                result.append(bitmap1[i])
+                i += 1
+            elif not (byte1 >> bit) & 1:
+                result.append(bitmap2[j])
+                j += 1
+            else:
+                result.append(merge_doc_info(bitmap1[i], bitmap2[j]))
+                i += 1
+                j += 1
+
+    return DocInfoBitmap(result, bitmap, bitmap1.lengths)
+
 def get_token_info_for_phrase(prev_len, prev_positions, curr_positions):
     """
     This method is used for phrase search.
@@ -174,28 +705,105 @@ def merge_doc_info(target, source):
     Merge two doc_info.
 
     Structure of doc_info: 
-    [
+    (
         doc_id,
-        {
+        TermInfos {
             term: (tf, [position]),
             ...
         }
-    ]
+    )
+
+    Neither doc info is modified: the merged doc info holds the term slots
+    of both (see `TermInfos`), which refer to the same `(tf, positions)`. If
+    the target already holds every term of the source, it is returned as is.
     """
     doc_id = target[0]
     target_doc_info = target[1]
     source_doc_info = source[1]
-    target_doc_info.update(source_doc_info)
-    return [doc_id, target_doc_info]
 
-def get_doc_info(term, posting, prev_doc_id):
+    target_terms = target_doc_info.terms
+    source_terms = source_doc_info.terms
+
+    # The same term in the same doc has the same info, so the target's is kept
+    new_terms = [term for term in source_terms if term not in target_terms]
+    if len(new_terms) == len(source_terms):
+        return (doc_id, TermInfos(target_terms + source_terms, \
+            target_doc_info.infos + source_doc_info.infos))
+    if len(new_terms) == 0:
+        return target
+
+    new_infos = [source_doc_info[term] for term in new_terms]
+    return (doc_id, TermInfos(target_terms + tuple(new_terms), \
+        target_doc_info.infos + tuple(new_infos)))
+
+def get_doc_info(term, doc_id, tf, positions):
     """
     Construct doc info for a posting.
     """
-    (gap, tf, positions) = posting
-    return [prev_doc_id + gap, {
-        term: (tf, positions)
-    }]
+    return (doc_id, TermInfos((term,), ((tf, positions),)))
+
+class TermInfos:
+    """
+    Represents the `(tf, positions)` of each term of a doc info, which can be
+    looked up by term like a dict.
+
+    The terms and their infos are kept as two parallel tuples of term
+    slots, which refer to the positions of the decoded postings instead of
+    copying them. Term infos are immutable, so that doc infos can be shared
+    by posting lists (e.g. the postings of a doc in the posting list of a
+    phrase, see `intersect`) and cached (see `PhraseCache`). Merging doc
+    infos builds new term infos instead (see `merge_doc_info`).
+
+    NOTE: A doc info only holds a few terms, so the slots are searched
+    linearly.
+    """
+    __slots__ = ('terms', 'infos')
+
+    def __init__(self, terms, infos):
+        self.terms = terms
+        self.infos = infos
+
+    def __len__(self):
+        return len(self.terms)
+
+    def __iter__(self):
+        return iter(self.terms)
+
+    def __contains__(self, term):
+        return term in self.terms
+
+    def __getitem__(self, term):
+        try:
+            return self.infos[self.terms.index(term)]
+        except ValueError:
+            raise KeyError(term)
+
+    def get_tf(self, term):
+        """
+        Returns the tf of the term, or 0 if the doc does not contain it.
+        """
+        terms = self.terms
+        if term in terms:
+            return self.infos[terms.index(term)][0]
+        return 0
+
+def get_bytes(bits, num_of_bytes=None):
+    """
+    Returns the bytes of a bitmap, in which the i-th bit is found at bit
+    i % 8 of byte i // 8.
+    """
+    if num_of_bytes is None:
+        num_of_bytes = (bits.bit_length() + 7) // 8
+    return bits.to_bytes(num_of_bytes, 'little')
+
+def count_set_bits(bitmap_bytes):
+    """
+    Returns the number of set bits in the bytes of a bitmap, which are
+    counted in C rather than byte by byte.
+
+    NOTE: `int.bit_count` requires Python 3.10.
+    """
+    return int.from_bytes(bitmap_bytes, 'little').bit_count()
 
 def get_skip_pointer(max_len, skip_len, i):
     """
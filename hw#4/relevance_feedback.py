@@ -0,0 +1,22 @@
+"""
+Parameters of the pseudo relevance feedback, which are shared by the search
+engine and by indexing, which precomputes the terms of each document that
+the feedback needs (see `create_blocks.compute_feedback_vectors`).
+"""
+
+# Relevance feedback
+K_DOCS = 10 # Number of relevant docs
+K_TERMS = 5 # Number of most frequent terms
+ALPHA = 1
+BETA = 0.75
+
+"""
+Number of terms kept for each document for relevance feedback. Rocchio
+feedback over K_DOCS documents, taking K_TERMS + 1 new terms from each (see
+`SearchEngine.refine_query_with_relevance_feedback`), never looks further
+than (K_TERMS + 1) * K_DOCS terms into a document.
+
+NOTE: An index only holds the terms needed by the K_DOCS and K_TERMS it was
+built with, so it must be rebuilt after either of them is increased.
+"""
+FEEDBACK_TERMS = (K_TERMS + 1) * K_DOCS
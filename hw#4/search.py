@@ -1,27 +1,64 @@
 #!/usr/bin/python3
 
 import sys
+import time
 import getopt
 
+# The imports are the first phase of the startup (see `print_startup_times`)
+import_start_time = time.perf_counter()
 from search_engine import SearchEngine
+from search_index import SearchIndex
+from query_executor import QueryExecutor
+from io_util import posting_list_cache
+import_time = time.perf_counter() - import_start_time
 
 def usage():
-    print("usage: " + sys.argv[0] + " -d dictionary-file -p postings-file -q query-file -o output-file-of-results")
+    print("usage: " + sys.argv[0] + " -d dictionary-file -p postings-file -q query-file -o output-file-of-results [-b [-w num-workers [-P]]] [-V]")
+    print("  -b: batch mode, runs every line of the query file (- for stdin) as a query and")
+    print("      writes the results of each query to one line of the output file (- for stdout)")
+    print("  -w: number of threads (or forked processes with -P) that run queries in batch mode")
+    print("  -V: score queries with NumPy arrays (requires numpy)")
 
-def run_search(dict_file, postings_file, query_file, results_file):
+def print_startup_times(search_index, other_times=None, file=sys.stdout):
+    """
+    Prints the time of each phase of the startup, i.e. the imports, the
+    phases of loading the index (see `SearchIndex.load_times`) and the
+    `(phase, seconds)` of any phases after it.
+
+    NOTE: nltk is only loaded on first use, so its loading time (if any) is
+    part of the time of the first query instead.
+    """
+    if other_times is None:
+        other_times = []
+    phase_times = [("imports", import_time)] + search_index.load_times + other_times
+    print("Startup: {}, total {:.3f}s".format(", ".join("{} {:.3f}s".format(phase, phase_time) \
+        for (phase, phase_time) in phase_times), sum(t for (_, t) in phase_times)), file=file)
+
+def run_search(dict_file, postings_file, query_file, results_file, is_vectorized=False):
     """
     using the given dictionary file and postings file,
     perform searching on the given query file and output the results to a file
+    (scoring with NumPy arrays if `is_vectorized` is set)
     """
 
     query_file = open(query_file, "r")
     results_file = open(results_file, "w")
 
-    engine = SearchEngine(dict_file, postings_file)
+    search_index = SearchIndex(dict_file, postings_file, is_vectorized)
+    engine = SearchEngine(search_index)
 
     query = query_file.readline()
 
+    start_time = time.perf_counter()
     (result, scores) = engine.run_query(query)
+    query_time = time.perf_counter() - start_time
+
+    # Diagnostics go to stderr, so that they are kept apart from the output
+    print_startup_times(search_index, file=sys.stderr)
+    print("Query time {:.3f}s".format(query_time), file=sys.stderr)
+    if engine.query_plan is not None:
+        print("Query plan:", file=sys.stderr)
+        print(engine.query_plan, file=sys.stderr)
 
     # TODO: remove (evaluation code)
     print("----------START-----------------")
@@ -81,13 +118,69 @@ def run_search(dict_file, postings_file, query_file, results_file):
     else:
         results_file.write(" ".join(map(str, result)))
         
+    search_index.close()
     query_file.close()
     results_file.close()
 
+def run_batch_search(dict_file, postings_file, query_file, results_file, \
+    num_workers=1, use_processes=False, is_vectorized=False):
+    """
+    using the given dictionary file and postings file,
+    perform searching on every query (one per line) in the given query file
+    and output the results of each query to one line of the results file
+
+    The index is only loaded once for all queries, which are streamed from
+    the query file and run by `num_workers` threads (or forked processes if
+    `use_processes` is set). `-` reads the queries from stdin and writes the
+    results to stdout. Queries are scored with NumPy arrays if `is_vectorized`
+    is set.
+    """
+    query_file = sys.stdin if query_file == "-" else open(query_file, "r")
+    results_file = sys.stdout if results_file == "-" else open(results_file, "w")
+
+    search_index = SearchIndex(dict_file, postings_file, is_vectorized)
+    start_time = time.perf_counter()
+    executor = QueryExecutor(search_index, num_workers, use_processes)
+    print_startup_times(search_index, [("workers", time.perf_counter() - start_time)], \
+        file=sys.stderr)
+
+    # Blank lines still get a (blank) result line, so results stay aligned with queries
+    queries = (query.rstrip("\n") for query in query_file)
+    for (query, future) in executor.run_queries(queries):
+        result = []
+        try:
+            (result, _) = future.result()
+        except Exception as e:
+            # A failing query should not abort the rest of the batch
+            print("Query failed:", query.strip(), repr(e), file=sys.stderr)
+
+        results_file.write(" ".join(map(str, result)) + "\n")
+        results_file.flush()
+
+    stats = executor.get_stats()
+    print("Ran {} queries in {:.3f}s ({:.1f} queries/s)".format(stats['queries'], \
+        stats['elapsed_time'], stats['throughput']), file=sys.stderr)
+    # NOTE: Forked processes have their own caches, which are not counted here
+    print("Posting list cache: {hits} hits, {misses} misses, {evictions} evictions, {bytes} bytes".format( \
+        **posting_list_cache.get_stats()), file=sys.stderr)
+    print("Phrase cache: {hits} hits, {misses} misses, {evictions} evictions, {postings} postings".format( \
+        **search_index.phrase_cache.get_stats()), file=sys.stderr)
+
+    executor.close()
+    search_index.close()
+    if query_file is not sys.stdin:
+        query_file.close()
+    if results_file is not sys.stdout:
+        results_file.close()
+
 dictionary_file = postings_file = file_of_query = output_file_of_results = None
+is_batch = False
+num_workers = 1
+use_processes = False
+is_vectorized = False
 
 try:
-    opts, args = getopt.getopt(sys.argv[1:], 'd:p:q:o:')
+    opts, args = getopt.getopt(sys.argv[1:], 'd:p:q:o:bw:PV')
 except getopt.GetoptError:
     usage()
     sys.exit(2)
@@ -101,6 +194,14 @@ for o, a in opts:
         file_of_query = a
     elif o == '-o':
         file_of_output = a
+    elif o == '-b':
+        is_batch = True
+    elif o == '-w':
+        num_workers = int(a)
+    elif o == '-P':
+        use_processes = True
+    elif o == '-V':
+        is_vectorized = True
     else:
         assert False, "unhandled option"
 
@@ -108,4 +209,8 @@ if dictionary_file == None or postings_file == None or file_of_query == None or
     usage()
     sys.exit(2)
 
-run_search(dictionary_file, postings_file, file_of_query, file_of_output)
+if is_batch:
+    run_batch_search(dictionary_file, postings_file, file_of_query, file_of_output, \
+        num_workers, use_processes, is_vectorized)
+else:
+    run_search(dictionary_file, postings_file, file_of_query, file_of_output, is_vectorized)
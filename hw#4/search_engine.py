@@ -1,16 +1,17 @@
 import heapq
+from bisect import bisect_left
+from itertools import accumulate
 from math import sqrt
 
-from io_util import load_lengths_and_dictionary, load_posting_list, load_term_info
-from query_util import calculate_weight, calculate_weighted_tf, intersect, is_phrase, calculate_idf, union
+from io_util import load_posting_list, load_posting_list_cursor, load_postings, load_term_info
+from query_util import calculate_weight, calculate_weighted_tf, intersect, is_phrase, calculate_idf, union, \
+    calculate_doc_weight, get_doc_weight, get_doc_weights, get_doc_ids, get_doc_info, merge_doc_info, \
+    find_common_doc_ids
 from tokenizer import tokenize_query, tokenize_boolean_query
 from query_expansion import query_expansion
-
-# Relevance feedback
-K_DOCS = 10 # Number of relevant docs
-K_TERMS = 5 # Number of most frequent terms
-ALPHA = 1
-BETA = 0.75
+from query_planner import plan_boolean_query
+from vector_scorer import VectorScorer, get_doc_weight_arrays
+from relevance_feedback import K_DOCS, K_TERMS, ALPHA, BETA
 
 # Phrase queries
 PHRASE_WEIGHT = 0.95
@@ -26,28 +27,54 @@ QUALITY_SCORE = {
     2 : 1
 }
 
+# Relative slack for pruning with upper bounds, so that rounding errors never prune a top k doc
+PRUNING_TOLERANCE = 1e-9
+
 class SearchEngine:
     """
     Represents a search engine which supports free text queries and boolean queries over
-    the specified dict_file and postings_file
+    the specified search_index
+
+    NOTE: The engine keeps the state of the query that it is running, so each
+    thread must use its own engine. The `SearchIndex` can be shared.
     """
 
-    def __init__(self, dict_file, postings_file):
-        # lengths is actually lengths_court_importance of format {docID: (length, court_importance)}
-        # courtImportance: 0, 1, 2 indicating importance from small to large
-        (self.lengths, self.dictionary) = load_lengths_and_dictionary(dict_file)
-        self.postings_file = postings_file
-        self.num_of_docs = len(self.lengths)
+    def __init__(self, search_index):
+        self.index = search_index
+        self.dictionary = search_index.dictionary
+        self.lengths = search_index.lengths
+        self.postings_file = search_index.postings_file
+        self.num_of_docs = search_index.num_of_docs
+        self.forward_index = search_index.forward_index
+        self.phrase_cache = search_index.phrase_cache
+        self.expansion_table = search_index.expansion_table
+        # Scores are accumulated in NumPy arrays instead of dictionaries if set
+        self.vector_scorer = None
+        if search_index.doc_arrays is not None:
+            self.vector_scorer = VectorScorer(search_index.doc_arrays, QUALITY_SCORE, QUALITY_WEIGHT)
         
-        self.phrase_dict = {} # Temporary dict to store document frequency for queries phrases
+        self.reset()
+
+    def reset(self):
+        """
+        Resets the state that is kept for a single query, so that the engine
+        can be reused for the next query.
+        """
+        self.phrase_doc_freqs = {} # Document frequency of the phrases whose posting lists were retrieved
         self.original_query_vec = {}
         self.query_vec = {}
         self.query_weight_set = False # Initially query weight is initialised to tf of each term in the query
+        self.query_plan = None # Plan of the boolean query (see `optimize_query_order`)
 
     def run_query(self, query):
         """
         Runs the given query and returns all the relevant docs
+
+        NOTE: The state of the previous query is reset first, so one engine
+        can run any number of queries.
         """
+        self.reset()
+
         is_boolean_query = "AND" in query
         is_phrasal_query = '"' in query
         
@@ -87,7 +114,7 @@ class SearchEngine:
         else: # Free text query
             self.query_vec = tokenize_query(query)
             self.query_vec = self.expand_free_text_query(self.query_vec)
-            scores = self.compute_cosine_score(self.query_vec)
+            scores = self.compute_top_k_scores(self.query_vec, K_DOCS)
             result = self.get_ranked_results(scores, k=K_DOCS)
 
             # Keep the scores for top K docs
@@ -111,45 +138,16 @@ class SearchEngine:
     
     def optimize_query_order(self, query_terms):
         """
-        Returns a sorted list of query terms by increasing document frequency.
-        The query terms might contain phrases.
-        """
-        doc_freqs = {}
-        for or_terms in query_terms:
-            if len(or_terms) == 1:
-                term = or_terms[0]
-                if is_phrase(term):
-                    if term in self.phrase_dict:
-                        doc_freq = len(self.phrase_dict[term])
-                    else:
-                        # Estimate the df of a phase to be min of the df of the individual words within the phrases
-                        doc_freq = self.num_of_docs
-                        phrase_words = term.split()
-                        for phrase_word in phrase_words:
-                            term_info = load_term_info(phrase_word, self.dictionary)
-                            if term_info is None:
-                                doc_freq = 0
-                                continue
-
-                            doc_freq = min(doc_freq, term_info.doc_freq)
-                else:
-                    term_info = load_term_info(term, self.dictionary)
-                    if term_info is None:
-                        doc_freq = 0
-                    else:
-                        doc_freq = term_info.doc_freq
-            else:
-                # Estimate the df to be the sum of df of each or_term
-                doc_freq = 0
-                for or_term in or_terms:
-                    term_info = load_term_info(or_term, self.dictionary)
-                    if term_info is None:
-                        continue
-                    else:
-                        doc_freq = max(doc_freq + term_info.doc_freq, self.num_of_docs)
-            doc_freqs[" ".join(or_terms)] = doc_freq
-        
-        return sorted(query_terms, key=lambda term:doc_freqs[" ".join(or_terms)])
+        Returns the clauses (groups of OR terms) of a boolean query in the
+        order they are intersected in, i.e. by increasing estimated number of
+        documents. If any clause cannot match any document, there are no
+        clauses to intersect (see `QueryPlan`). The query terms might contain
+        phrases.
+
+        The chosen plan is kept in query_plan for inspection (see `QueryPlan`).
+        """
+        self.query_plan = plan_boolean_query(query_terms, self.dictionary, self.num_of_docs)
+        return self.query_plan.get_clauses()
 
     def get_posting_list(self, query_term, is_strict=True):
         """
@@ -157,12 +155,15 @@ class SearchEngine:
 
         Structure of posting list:
         [
-            [doc_id, {
-                term: [tf, positions],
+            (doc_id, TermInfos {
+                term: (tf, positions),
                 ...
-            }],
+            }),
             ...
         ]
+
+        NOTE: Posting lists and their doc infos are shared with caches, so they
+        are never modified.
         
         The query_term can either be a phrase or a single term. 
         If the query term is a single term, its posting list is retrieved from 
@@ -173,45 +174,107 @@ class SearchEngine:
         When is_strict is set to True, the returned posting list only contains docs 
         with the exact phrase. When is_strict is set to False, the returned posting 
         list also contains docs without the exact phrase but with words within the phrase.
+
+        If the first two words of the phrase are a biword in the index, the posting
+        list of the biword is used instead of matching the positions of the two words
+        (see `get_biword_posting_list`).
         """
         phrase_words = query_term.split()
         if len(phrase_words) == 1: # Single term retrieval
-            return load_posting_list(query_term, self.dictionary, self.postings_file)
+            return load_posting_list(query_term, self.dictionary, self.postings_file, self.lengths)
         else: # Phrase query
-            if query_term in self.phrase_dict:
-                return self.phrase_dict[query_term]
+            curr_result = self.phrase_cache.get(query_term, is_strict)
+            if curr_result is not None:
+                self.phrase_doc_freqs[query_term] = len(curr_result)
+                return curr_result
             
             first_word = phrase_words[0]
-            curr_result = self.get_posting_list(first_word)
-            curr_phrase = [first_word]
+            biword = " ".join(phrase_words[:2])
+            if load_term_info(biword, self.dictionary) is not None:
+                curr_result = self.get_biword_posting_list(phrase_words[0], phrase_words[1], is_strict)
+                curr_phrase = phrase_words[:2]
+            else:
+                curr_result = self.get_posting_list(first_word)
+                curr_phrase = [first_word]
             
-            for phrase_word in phrase_words[1:]:
+            for phrase_word in phrase_words[len(curr_phrase):]:
                 # No need to continue if the current result is already empty
                 if len(curr_result) == 0:
                     break
 
-                posting_list = self.get_posting_list(phrase_word)
+                # Blocks of postings that cannot match are skipped without decoding them
+                posting_list = load_posting_list_cursor(phrase_word, self.dictionary, self.postings_file)
                 curr_result = intersect(curr_result, posting_list, phrase_word, " ".join(curr_phrase), is_strict)
                 curr_phrase.append(phrase_word)
             
             # Cache posting list for phrase
-            self.phrase_dict[query_term] = curr_result
+            self.phrase_cache.put(query_term, is_strict, curr_result)
+            self.phrase_doc_freqs[query_term] = len(curr_result)
 
             return curr_result
     
+    def get_biword_posting_list(self, first_word, second_word, is_strict=True):
+        """
+        Returns the posting list of the phrase made up of two words, using the
+        posting list of the biword. The posting list is the same as the one that
+        is found by intersecting the posting lists of the two words (see
+        `query_util.intersect`), without matching their positions.
+
+        When is_strict is set to True, only the docs in the posting list of the
+        biword are looked up in the posting lists of the words. Otherwise, all
+        docs that contain both words are.
+
+        NOTE: Assumes that the biword exists.
+        """
+        biword = " ".join([first_word, second_word])
+        (biword_doc_ids, biword_tfs, biword_position_lists) = \
+            load_postings(biword, self.dictionary, self.postings_file)
+        (doc_ids1, tfs1, position_lists1) = load_postings(first_word, self.dictionary, self.postings_file)
+        (doc_ids2, tfs2, position_lists2) = load_postings(second_word, self.dictionary, self.postings_file)
+
+        if is_strict:
+            doc_ids = biword_doc_ids
+        else:
+            doc_ids = find_common_doc_ids(doc_ids1, doc_ids2)
+
+        result = []
+        k = 0
+        for doc_id in doc_ids:
+            i = bisect_left(doc_ids1, doc_id)
+            j = bisect_left(doc_ids2, doc_id)
+            doc_info = get_doc_info(first_word, doc_id, tfs1[i], position_lists1[i])
+            word_info = get_doc_info(second_word, doc_id, tfs2[j], position_lists2[j])
+
+            doc_info = merge_doc_info(doc_info, word_info)
+
+            # The docs of the biword are a subset of doc_ids
+            if k < len(biword_doc_ids) and biword_doc_ids[k] == doc_id:
+                phrase_info = get_doc_info(biword, doc_id, biword_tfs[k], biword_position_lists[k])
+                doc_info = merge_doc_info(doc_info, phrase_info)
+                result.append(doc_info)
+                k += 1
+
+                if is_strict:
+                    result.append(doc_info)
+
+            if not is_strict:
+                result.append(doc_info)
+
+        return result
+
     def get_document_frequency(self, term):
         """
         Returns the document frequency of the given term.
         The term can be either a phrase or a term.
         If it is a phrase, it only returns the document frequency
-        when the phrase in present in phrase_dict. 
+        when the phrase in present in phrase_doc_freqs. 
         (You must retrieve its posting list before calling this method)
         """
         if is_phrase(term):
-            if term not in self.phrase_dict:
+            if term not in self.phrase_doc_freqs:
                 return None
             
-            return len(self.phrase_dict[term])
+            return self.phrase_doc_freqs[term]
         else:
             term_info = load_term_info(term, self.dictionary)
             if term_info is None:
@@ -220,14 +283,11 @@ class SearchEngine:
             return term_info.doc_freq
     
     def merge_posting_lists(self, terms):
-        if len(terms) == 1:
-            return self.get_posting_list(terms[0], is_strict=False)
-        else:
-            curr_result = []
-            for term in terms:
-                posting_list = self.get_posting_list(term, is_strict=False)
-                curr_result = union(curr_result, posting_list)
-            return curr_result
+        curr_result = self.get_posting_list(terms[0], is_strict=False)
+        for term in terms[1:]:
+            posting_list = self.get_posting_list(term, is_strict=False)
+            curr_result = union(curr_result, posting_list)
+        return curr_result
 
 
     def handle_boolean_query(self, query_terms):
@@ -236,22 +296,32 @@ class SearchEngine:
         returns a posting list where each doc contains each of the
         term in query_terms. Note: relaxed posting lists for phrases
         are used.
+
+        The clauses are intersected in the given order (see
+        `optimize_query_order`). As the clauses are ANDed, the result is empty
+        as soon as a posting list or the intersection is empty, and the posting
+        lists of the remaining clauses are not loaded.
         """
         if len(query_terms) == 0:
             return []
+
+        curr_result = None
         
-        first_term = query_terms[0]
-        curr_result = self.merge_posting_lists(first_term)
-        curr_phrase = [first_term]
-        
-        for term in query_terms[1:]:
+        for term in query_terms:
             posting_list = self.merge_posting_lists(term)
             
-            # Ignore non-existing term
+            # No doc contains the clause, so none matches the query
             if len(posting_list) == 0:
-                continue
+                return []
             
-            curr_result = intersect(curr_result, posting_list)
+            if curr_result is None:
+                curr_result = posting_list
+            else:
+                curr_result = intersect(curr_result, posting_list)
+
+            # The remaining clauses cannot add any docs back
+            if len(curr_result) == 0:
+                return []
         
         return curr_result
     
@@ -264,7 +334,7 @@ class SearchEngine:
             expanded_query_vec[term] = tf * EXPANSION_WEIGHT
             if is_phrase(term):
                 continue
-            expanded_terms = query_expansion(term, self.dictionary)
+            expanded_terms = query_expansion(term, self.dictionary, self.expansion_table)
             for expanded_term in expanded_terms:
                 if expanded_term not in expanded_query_vec:
                     expanded_query_vec[expanded_term] = 0
@@ -284,12 +354,11 @@ class SearchEngine:
             
             or_terms = []
             or_terms.append(term)
-            expanded_terms = query_expansion(term, self.dictionary)
+            expanded_terms = query_expansion(term, self.dictionary, self.expansion_table)
             for expanded_term in expanded_terms:
                 or_terms.append(expanded_term)
             expanded_query_terms.append(or_terms)
         
-        print(expanded_query_terms)
         return expanded_query_terms
     
     def refine_query_with_relevance_feedback(self, query_vec, relevant_docs):
@@ -301,20 +370,17 @@ class SearchEngine:
 
         doc_vec_sum = {}
         for doc_id in relevant_docs:
-            doc_vec = self.lengths[doc_id][0][1]
+            # Already sorted by descending tf-idf
+            doc_vec = self.forward_index.get_vector(self.lengths.get_internal_id(doc_id))
 
             count = 0
 
-            # Sort by descending tf-idf
-            doc_vec = sorted(doc_vec, key=lambda term_tf : term_tf[1] * calculate_idf(self.num_of_docs, self.get_document_frequency(term_tf[0])), reverse=True)
-
-            for term, weighted_tf in doc_vec:
+            for term, tf_idf in doc_vec:
                 if count > K_TERMS:
                     break
                 if term not in doc_vec_sum:
                      doc_vec_sum[term] = 0
                      count += 1
-                tf_idf = weighted_tf * calculate_idf(self.num_of_docs, self.get_document_frequency(term))
                 doc_vec_sum[term] += BETA * tf_idf / len(relevant_docs)
         
         for term, weight in  doc_vec_sum.items():
@@ -335,7 +401,14 @@ class SearchEngine:
 
         The phrase_weight value determines how much weight is given to docs with exact 
         phrase in the query vec.
+
+        If the engine is vectorized, the same scores are computed with NumPy
+        arrays instead (see `compute_vectorized_scores`).
         """
+        if self.vector_scorer is not None:
+            self.compute_vectorized_scores(query_vec, documents, phrase_weight)
+            return self.vector_scorer.get_scores()
+
         scores = {}
         for term, query_weight in query_vec.items():
             if documents is None: # Free text queries
@@ -353,27 +426,7 @@ class SearchEngine:
                 query_weight = calculate_weight(query_weight, self.num_of_docs, doc_freq)
                 query_vec[term] = query_weight
 
-            for doc_id_info in posting_list:
-                doc_id = doc_id_info[0]
-                doc_info = doc_id_info[1]
-                if term in doc_info:
-                    (term_freq, _) = doc_info[term]
-                else:
-                    term_freq = 0
-                
-                phrase_words = term.split()
-                doc_weight = 0
-
-                for phrase_word in phrase_words:
-                    # Term freq refers to the tf of the phrase
-                    # Phrase word tf referts to the tf of one word within the phrase
-                    if phrase_word not in doc_info:
-                        phrase_word_tf = 0
-                    else:
-                        (phrase_word_tf, _) = doc_info[phrase_word]
-                    adjusted_tf = term_freq + (phrase_word_tf - term_freq) * (1 - phrase_weight)
-                    doc_weight += calculate_weighted_tf(adjusted_tf)
-
+            for (doc_id, doc_weight) in get_doc_weights(term, posting_list, phrase_weight):
                 if doc_id not in scores:
                     scores[doc_id] = 0
                 scores[doc_id] += query_weight * doc_weight
@@ -382,12 +435,181 @@ class SearchEngine:
                 self.query_weight_set = False
 
         for doc_id, similarity_score in scores.items():
-            quality_score = QUALITY_SCORE[self.lengths[doc_id][1]]
-            doc_len = self.lengths[doc_id][0][0]
-            scores[doc_id] = QUALITY_WEIGHT * quality_score + (1 - QUALITY_WEIGHT) * similarity_score / doc_len
+            scores[doc_id] = self.compute_final_score(doc_id, similarity_score)
         
         return scores
 
+    def compute_final_score(self, doc_id, similarity_score):
+        """
+        Combines the (unnormalised) cosine similarity score of a doc with its
+        quality score.
+        """
+        quality_score = QUALITY_SCORE[self.lengths.get_court_importance(doc_id)]
+        doc_len = self.lengths.get_length(doc_id)
+        return QUALITY_WEIGHT * quality_score + (1 - QUALITY_WEIGHT) * similarity_score / doc_len
+
+    def compute_vectorized_scores(self, query_vec, documents=None, phrase_weight=PHRASE_WEIGHT):
+        """
+        Computes the same scores as `compute_cosine_score` does in the vector
+        scorer of the engine (see `VectorScorer`).
+
+        The weights of each term in all docs are computed at once. For single
+        terms of free text queries, they are computed from the arrays of their
+        posting lists without building any doc infos.
+        """
+        self.vector_scorer.reset()
+        for term, query_weight in query_vec.items():
+            if documents is None: # Free text queries
+                posting_list = self.get_posting_list(term, is_strict=False)
+            else: # Boolean queries
+                posting_list = documents
+
+            doc_freq = self.get_document_frequency(term)
+
+            if doc_freq is None:
+                continue
+
+            if not self.query_weight_set:
+                self.original_query_vec[term] = query_weight
+                query_weight = calculate_weight(query_weight, self.num_of_docs, doc_freq)
+                query_vec[term] = query_weight
+
+            (doc_ids, doc_weights) = get_doc_weight_arrays(term, posting_list, phrase_weight)
+            self.vector_scorer.add(doc_ids, query_weight * doc_weights)
+
+    def compute_top_k_scores(self, query_vec, k, phrase_weight=PHRASE_WEIGHT):
+        """
+        Computes the same scores as `compute_cosine_score` does for all documents,
+        but only fully scores the documents that can still enter the top k.
+
+        Documents are scored one at a time with MaxScore dynamic pruning. Each term 
+        has an upper bound on its contribution to the score (see `get_upper_bound`). 
+        Once k documents have been scored, the terms whose upper bounds add up to less
+        than the k-th highest score are non-essential: documents that only contain 
+        non-essential terms are skipped, and the remaining terms of a document are 
+        only looked up while the document can still reach the k-th highest score.
+
+        Returns the scores of the top k docs (and of any docs tied with them).
+
+        If the engine is vectorized, all documents are scored with NumPy arrays
+        instead, and the top k of them are selected (see `VectorScorer`).
+        """
+        if self.vector_scorer is not None:
+            self.compute_vectorized_scores(query_vec, phrase_weight=phrase_weight)
+            return self.vector_scorer.get_top_k_scores(k)
+
+        cursors = []
+        for term, query_weight in query_vec.items():
+            posting_list = self.get_posting_list(term, is_strict=False)
+            doc_freq = self.get_document_frequency(term)
+
+            if doc_freq is None:
+                continue
+
+            if not self.query_weight_set:
+                self.original_query_vec[term] = query_weight
+                query_weight = calculate_weight(query_weight, self.num_of_docs, doc_freq)
+                query_vec[term] = query_weight
+
+            upper_bound = self.get_upper_bound(term, posting_list, query_weight, phrase_weight)
+            cursors.append(TermCursor(len(cursors), term, posting_list, query_weight, upper_bound))
+
+        # Sort by increasing upper bound, so that non-essential terms form a prefix
+        cursors.sort(key=lambda cursor: cursor.upper_bound)
+        bounds = list(accumulate(cursor.upper_bound for cursor in cursors))
+        
+        scores = {}
+        top_scores = [] # Min heap of the k highest scores
+        threshold = 0
+        first_essential = 0
+
+        while True:
+            while first_essential < len(cursors) and \
+                not self.can_enter_top_k(bounds[first_essential], threshold):
+                first_essential += 1
+
+            doc_ids = [cursor.get_doc_id() for cursor in cursors[first_essential:]]
+            doc_id = min([doc_id for doc_id in doc_ids if doc_id is not None], default=None)
+            if doc_id is None:
+                break
+
+            contributions = {}
+            partial_score = 0
+            for cursor in cursors[first_essential:]:
+                if cursor.get_doc_id() == doc_id:
+                    contributions[cursor.order] = cursor.next_contributions(phrase_weight)
+                    partial_score += sum(contributions[cursor.order])
+
+            doc_len = self.lengths.get_length(doc_id)
+            is_pruned = False
+            for i in range(first_essential - 1, -1, -1):
+                if not self.can_enter_top_k(partial_score / doc_len + bounds[i], threshold):
+                    is_pruned = True
+                    break
+                
+                cursor = cursors[i]
+                cursor.skip_to(doc_id)
+                if cursor.get_doc_id() == doc_id:
+                    contributions[cursor.order] = cursor.next_contributions(phrase_weight)
+                    partial_score += sum(contributions[cursor.order])
+
+            if is_pruned:
+                continue
+            
+            # Add up contributions in query order, exactly as `compute_cosine_score` does
+            similarity_score = 0
+            for order in sorted(contributions):
+                for contribution in contributions[order]:
+                    similarity_score += contribution
+            score = self.compute_final_score(doc_id, similarity_score)
+
+            if score <= 0 or score < threshold:
+                continue
+
+            scores[doc_id] = score
+            heapq.heappush(top_scores, score)
+            if len(top_scores) > k:
+                heapq.heappop(top_scores)
+            if len(top_scores) == k:
+                threshold = top_scores[0]
+
+        return {doc_id: score for doc_id, score in scores.items() if score >= threshold}
+
+    def can_enter_top_k(self, upper_bound, threshold):
+        """
+        Returns True if a doc whose (normalised) cosine similarity score is at most 
+        upper_bound can still have a score that reaches the threshold.
+        """
+        max_quality_score = max(QUALITY_SCORE.values())
+        max_score = QUALITY_WEIGHT * max_quality_score + (1 - QUALITY_WEIGHT) * upper_bound
+        return max_score >= threshold * (1 - PRUNING_TOLERANCE)
+
+    def get_upper_bound(self, term, posting_list, query_weight, phrase_weight):
+        """
+        Returns an upper bound on the contribution of the term to the (normalised) 
+        cosine similarity score of any doc. The bound is never negative, as docs 
+        that do not contain the term get a contribution of 0.
+
+        For single terms, the weights in docs are positive, and the bound is derived
+        from the maximum normalised weight precomputed in the dictionary. For phrases,
+        both the query weight and the weights in docs can be negative, so the bound 
+        is computed exactly from the posting list of the phrase.
+        """
+        if not is_phrase(term):
+            return max(query_weight, 0) * load_term_info(term, self.dictionary).max_score
+        
+        upper_bound = 0
+        doc_weights = {}
+        for doc_id_info in posting_list:
+            doc_id = doc_id_info[0]
+            doc_weight = calculate_doc_weight(term, doc_id_info[1], phrase_weight)
+            # A doc may appear more than once in the posting list of a phrase
+            doc_weights[doc_id] = doc_weights.get(doc_id, 0) + doc_weight
+            doc_len = self.lengths.get_length(doc_id)
+            upper_bound = max(upper_bound, query_weight * doc_weights[doc_id] / doc_len)
+        
+        return upper_bound
+
     def get_ranked_results(self, scores, k=None, threshold=None, excluding=None):
         """
         Returns the top k docIDs with highest cosine similarity scores.
@@ -423,7 +645,7 @@ class SearchEngine:
         pairs = []
         for doc_id, score in scores.items():
             if score > 0:
-                quality = self.lengths[doc_id][1]
+                quality = self.lengths.get_court_importance(doc_id)
                 pairs.append(DocScorePair(doc_id, score, quality))
 
         # Transform list of doc-score pairs into a heap, in-place, in linear time
@@ -432,6 +654,49 @@ class SearchEngine:
         return pairs
 
 
+class TermCursor(object):
+    """
+    Represents a cursor over the posting list of a query term, which is used to
+    score documents one at a time.
+    """
+    def __init__(self, order, term, posting_list, query_weight, upper_bound):
+        self.order = order # Position of the term in the query
+        self.term = term
+        self.posting_list = posting_list
+        self.doc_ids = list(get_doc_ids(posting_list))
+        self.query_weight = query_weight
+        self.upper_bound = upper_bound
+        self.index = 0
+
+    def get_doc_id(self):
+        """
+        Returns the docID the cursor is at, or None if the cursor is exhausted.
+        """
+        if self.index >= len(self.doc_ids):
+            return None
+        return self.doc_ids[self.index]
+
+    def skip_to(self, doc_id):
+        """
+        Moves the cursor to the first posting whose docID is at least doc_id.
+        """
+        self.index = bisect_left(self.doc_ids, doc_id, self.index)
+
+    def next_contributions(self, phrase_weight):
+        """
+        Returns the (unnormalised) score contributions of the term to the doc the
+        cursor is at, and moves the cursor to the next doc. There is one contribution
+        for each posting of the doc.
+        """
+        doc_id = self.get_doc_id()
+        contributions = []
+        while self.get_doc_id() == doc_id:
+            doc_weight = get_doc_weight(self.term, self.posting_list, self.index, phrase_weight)
+            contributions.append(self.query_weight * doc_weight)
+            self.index += 1
+        return contributions
+
+
 class DocScorePair(object):
     """
     Represents a (docID, score) pair which can be compared with "<" operator
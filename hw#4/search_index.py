@@ -0,0 +1,102 @@
+import os
+import time
+
+from io_util import load_dictionary, get_side_file_path, posting_list_cache, STEMS_FILE, STOPWORDS_FILE, \
+    LENGTHS_FILE, FORWARD_FILE, EXPANSIONS_FILE
+from tokenizer import stem_cache, load_stopwords
+from postings_file import PostingsFile
+from doc_lengths import DocLengths
+from forward_index import ForwardIndex
+from phrase_cache import PhraseCache
+from query_expansion import ExpansionTable
+from vector_scorer import DocArrays, is_numpy_available
+
+class SearchIndex:
+    """
+    Represents the index that is searched, i.e. the dictionary, the lengths
+    and court importance of the docs, the postings file and the forward
+    index, which are loaded from the specified dict_file and postings_file.
+
+    The index is never modified after it is loaded, so one index can be
+    shared by any number of `SearchEngine`s, including ones that run in
+    other threads or in forked processes. Besides, the index holds the
+    cache of the posting lists of phrases that is shared by the engines.
+
+    NOTE: The stems and stopwords saved with the index are not held by the
+    index: loading it adds the stems to the process-global `stem_cache` and
+    replaces the process-global stopwords of `tokenizer`, which query
+    tokenization uses. All indexes loaded in a process share these tables.
+    A stem only depends on its word and every index saves the same
+    stopwords, so indexes over different directories never conflict, but
+    the known stems of all of them are kept.
+
+    If is_vectorized is set, the engines score free text queries with NumPy
+    arrays (see `VectorScorer`), which requires numpy to be installed.
+
+    The time of each phase of loading the index is recorded in `load_times`.
+    """
+
+    def __init__(self, dict_file, postings_file, is_vectorized=False):
+        if is_vectorized and not is_numpy_available():
+            raise ImportError("numpy is required for vectorized scoring")
+
+        # (phase, seconds) of each phase of loading the index, in order
+        self.load_times = []
+        start_time = time.perf_counter()
+
+        self.dictionary = load_dictionary(dict_file)
+        start_time = self.record_load_time("dictionary", start_time)
+        # lengths holds the length and court importance of each doc in compact arrays
+        # courtImportance: 0, 1, 2 indicating importance from small to large
+        self.lengths = DocLengths(get_side_file_path(dict_file, LENGTHS_FILE))
+        # The postings file stays memory-mapped for the lifetime of the index
+        self.postings_file = PostingsFile(postings_file)
+        self.num_of_docs = len(self.lengths)
+        # Top terms of each doc by tf-idf, precomputed for relevance feedback and
+        # only read for the feedback docs
+        self.forward_index = ForwardIndex(get_side_file_path(dict_file, FORWARD_FILE))
+        # Posting lists of phrases, shared by all queries over the index
+        self.phrase_cache = PhraseCache()
+        self.is_vectorized = is_vectorized
+        # Arrays of all docs for the vectorized scorers of the engines, which
+        # only allocate the scores of their own query
+        self.doc_arrays = DocArrays(self.lengths) if is_vectorized else None
+        start_time = self.record_load_time("lengths and postings", start_time)
+
+        # Stems learned during indexing, so that known query words are never stemmed
+        # again. They are added to the process-global cache (see the NOTE above)
+        stems_file = get_side_file_path(dict_file, STEMS_FILE)
+        if os.path.isfile(stems_file):
+            stem_cache.load(stems_file)
+        # Stopwords saved during indexing, so that nltk is not needed to load them
+        stopwords_file = get_side_file_path(dict_file, STOPWORDS_FILE)
+        if os.path.isfile(stopwords_file):
+            load_stopwords(stopwords_file)
+        start_time = self.record_load_time("stems and stopwords", start_time)
+
+        # Expanded terms precomputed during indexing, if any, so that WordNet is
+        # only looked up for query terms that are not in the dictionary
+        self.expansion_table = None
+        expansions_file = get_side_file_path(dict_file, EXPANSIONS_FILE)
+        if os.path.isfile(expansions_file):
+            self.expansion_table = ExpansionTable(expansions_file, self.dictionary)
+        self.record_load_time("expansions", start_time)
+
+    def record_load_time(self, phase, start_time):
+        """
+        Records the time that a phase of loading the index took since
+        `start_time`, and returns the current time, i.e. the start time of
+        the next phase.
+        """
+        end_time = time.perf_counter()
+        self.load_times.append((phase, end_time - start_time))
+        return end_time
+
+    def close(self):
+        """
+        Releases the postings file and forward index held by the index, and
+        drops the posting lists of the postings file from the shared cache.
+        """
+        posting_list_cache.remove_file(self.postings_file.identity)
+        self.postings_file.close()
+        self.forward_index.close()
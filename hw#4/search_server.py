@@ -0,0 +1,239 @@
+#!/usr/bin/python3
+
+import sys
+import json
+import time
+import signal
+import getopt
+import asyncio
+
+from search_index import SearchIndex
+from query_executor import QueryExecutor
+from relevance_feedback import K_DOCS
+
+"""
+Address that the server listens on by default. Only local clients are
+served, as there is no authentication.
+"""
+HOST = "127.0.0.1"
+PORT = 8000
+
+"""
+Number of workers that run queries by default.
+"""
+NUM_WORKERS = 4
+
+"""
+Maximum number of requests that are being run or waiting for a worker.
+Further requests are rejected until some of them are done.
+"""
+MAX_PENDING_REQUESTS = 64
+
+"""
+Maximum size (in bytes) of a request line.
+"""
+MAX_REQUEST_SIZE = 64 * 1024
+
+"""
+Number of results returned for a request that does not give `k`, i.e. the
+number of top docs that the engine ranks a free text query by.
+"""
+DEFAULT_K = K_DOCS
+
+def usage():
+    print("usage: " + sys.argv[0] + " -d dictionary-file -p postings-file [-a address] [-n port] [-w num-workers [-P]] [-l max-pending-requests]")
+    print("  serves queries sent as JSON lines, e.g. {\"id\": 1, \"query\": \"\\\"fertility treatment\\\" AND damages\", \"k\": 10}")
+    print("  and responds with a JSON line {\"id\": 1, \"results\": [[docID, score], ...], \"timing\": {...}}")
+
+class SearchServer:
+    """
+    Represents a local server that runs the queries it receives over a
+    shared `SearchIndex`, using a `QueryExecutor`.
+
+    Each request is a JSON object on one line, which holds the `query`
+    (free text or boolean, possibly with phrases), and optionally an `id`
+    that is echoed back and the number `k` (a positive integer) of results
+    to return, which is DEFAULT_K if it is not given. Each
+    response is a JSON object on one line, which holds the ranked
+    `[docID, score]` pairs in `results` (or an `error`) and the `timing` of
+    the request in milliseconds. A connection can send any number of
+    requests, which are answered in order.
+
+    At most `max_pending_requests` requests are being run or waiting for a
+    worker at any time. Further requests are rejected right away, so that
+    clients are never stuck behind a long queue.
+    """
+
+    def __init__(self, executor, max_pending_requests=MAX_PENDING_REQUESTS):
+        self.executor = executor
+        self.max_pending_requests = max_pending_requests
+        self.num_of_pending_requests = 0
+        self.is_stopping = False
+        # Maps the task that handles each connection to its (reader, writer)
+        self.connections = {}
+
+    async def serve(self, host, port):
+        """
+        Serves requests on host:port until SIGINT or SIGTERM is received.
+        Then, the server stops accepting connections and requests, and shuts
+        down once the requests that are being run are answered.
+        """
+        loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stop.set)
+
+        server = await asyncio.start_server(self.handle_connection, host, port, \
+            limit=MAX_REQUEST_SIZE)
+        print("Serving on {}:{}".format(host, port), file=sys.stderr)
+
+        await stop.wait()
+
+        print("Shutting down...", file=sys.stderr)
+        self.is_stopping = True
+        server.close()
+        await server.wait_closed()
+
+        # Stop reading from the connections, so that each connection is closed
+        # once the request it is running is answered
+        for (reader, writer) in self.connections.values():
+            writer.transport.pause_reading()
+            reader.feed_eof()
+        await asyncio.gather(*self.connections, return_exceptions=True)
+
+    async def handle_connection(self, reader, writer):
+        """
+        Answers the requests sent on a connection, one at a time.
+        """
+        task = asyncio.current_task()
+        self.connections[task] = (reader, writer)
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # The request line is longer than MAX_REQUEST_SIZE
+                    writer.write(encode_response({"error": "request too large"}))
+                    break
+                if not line:
+                    break
+                if line.strip() == b"":
+                    continue
+
+                if self.is_stopping:
+                    # Requests that were already buffered are not run
+                    writer.write(encode_response({"error": "server is shutting down"}))
+                    break
+
+                response = await self.handle_request(line)
+                writer.write(encode_response(response))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            del self.connections[task]
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def handle_request(self, line):
+        """
+        Runs the query of a request line, and returns the response.
+        """
+        start_time = time.perf_counter()
+
+        try:
+            request = json.loads(line)
+            query = request["query"]
+            k = request.get("k", DEFAULT_K)
+            # bool is a subclass of int, but true and false are not valid numbers of results
+            assert isinstance(query, str) and isinstance(k, int) and not isinstance(k, bool) and k >= 1
+        except (ValueError, TypeError, KeyError, AssertionError):
+            return {"error": "invalid request"}
+
+        response = {"id": request.get("id")}
+        if self.num_of_pending_requests >= self.max_pending_requests:
+            response["error"] = "too many pending requests"
+            return response
+
+        self.num_of_pending_requests += 1
+        try:
+            future = self.executor.submit(query, is_timed=True)
+            (result, scores, run_time) = await asyncio.wrap_future(future)
+        except Exception as e:
+            response["error"] = "query failed: {!r}".format(e)
+            return response
+        finally:
+            self.num_of_pending_requests -= 1
+
+        total_time = time.perf_counter() - start_time
+        response["results"] = [[doc_id, scores[doc_id]] for doc_id in result[:k]]
+        response["timing"] = {
+            "queue_ms": (total_time - run_time) * 1000,
+            "run_ms": run_time * 1000,
+            "total_ms": total_time * 1000
+        }
+        return response
+
+def encode_response(response):
+    """
+    Encodes a response as a JSON line.
+    """
+    return (json.dumps(response) + "\n").encode()
+
+def run_server(dict_file, postings_file, host=HOST, port=PORT, num_workers=NUM_WORKERS, \
+    use_processes=False, max_pending_requests=MAX_PENDING_REQUESTS):
+    """
+    using the given dictionary file and postings file,
+    serve queries on host:port until the server is stopped
+    """
+    search_index = SearchIndex(dict_file, postings_file)
+    executor = QueryExecutor(search_index, num_workers, use_processes)
+    server = SearchServer(executor, max_pending_requests)
+
+    try:
+        asyncio.run(server.serve(host, port))
+    finally:
+        executor.close()
+        search_index.close()
+
+if __name__ == "__main__":
+    dictionary_file = postings_file = None
+    host = HOST
+    port = PORT
+    num_workers = NUM_WORKERS
+    use_processes = False
+    max_pending_requests = MAX_PENDING_REQUESTS
+
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'd:p:a:n:w:Pl:')
+    except getopt.GetoptError:
+        usage()
+        sys.exit(2)
+
+    for o, a in opts:
+        if o == '-d':
+            dictionary_file = a
+        elif o == '-p':
+            postings_file = a
+        elif o == '-a':
+            host = a
+        elif o == '-n':
+            port = int(a)
+        elif o == '-w':
+            num_workers = int(a)
+        elif o == '-P':
+            use_processes = True
+        elif o == '-l':
+            max_pending_requests = int(a)
+        else:
+            assert False, "unhandled option"
+
+    if dictionary_file == None or postings_file == None:
+        usage()
+        sys.exit(2)
+
+    run_server(dictionary_file, postings_file, host, port, num_workers, \
+        use_processes, max_pending_requests)
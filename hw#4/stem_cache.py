@@ -0,0 +1,140 @@
+import pickle
+import threading
+from collections import OrderedDict
+
+class StemCache:
+    """
+    Represents a bounded LRU cache of the stems of words, which sits in
+    front of a (slow) stemmer. The stemmer is only created by `create_stemmer`
+    on the first miss, so a cache of known stems can be used without it.
+
+    Besides the LRU entries, the cache can hold a table of known stems
+    (e.g. one that was persisted while indexing), which is never evicted.
+    Hits, misses and evictions are counted.
+
+    If `track_new_stems` is set (e.g. while indexing), every stem that is
+    computed or added is also recorded in a table of new stems, which is
+    never evicted either, so that all of them can be saved (see `save`) or
+    sent elsewhere (see `pop_new_stems`). It is not set by default, so that
+    a long-lived cache (e.g. of a search server) stays bounded.
+
+    NOTE: The cache is thread-safe, so one cache can be shared by threads
+    that run queries concurrently. The lock is only held to look up and add
+    stems, so the stemmer itself must be safe to call from several threads
+    (the Porter stemmer keeps no state between calls).
+    """
+    MAX_SIZE = 100000
+
+    def __init__(self, create_stemmer, max_size=MAX_SIZE):
+        self.create_stemmer = create_stemmer
+        self.stemmer = None
+        self.max_size = max_size
+        self.cache = OrderedDict()
+        self.known_stems = {}
+        self.track_new_stems = False
+        self.new_stems = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.RLock()
+
+    def stem(self, word):
+        """
+        Returns the stem of `word`, which is only computed by the stemmer
+        if it is not found in the cache.
+        """
+        with self.lock:
+            stem = self.known_stems.get(word)
+            if stem is not None:
+                self.hits += 1
+                return stem
+
+            stem = self.cache.get(word)
+            if stem is not None:
+                self.hits += 1
+                self.cache.move_to_end(word)
+                return stem
+
+            self.misses += 1
+            if self.stemmer is None:
+                self.stemmer = self.create_stemmer()
+            stemmer = self.stemmer
+
+        # The lock is not held while stemming, so that a miss does not block the
+        # lookups of other threads. A word missed by two threads is stemmed twice.
+        stem = stemmer.stem(word)
+        with self.lock:
+            self.add(word, stem)
+            if self.track_new_stems:
+                self.new_stems[word] = stem
+        return stem
+
+    def add(self, word, stem):
+        """
+        Adds the stem of `word` to the cache, evicting the least recently
+        used entry if the cache is full.
+        """
+        with self.lock:
+            self.cache[word] = stem
+            self.cache.move_to_end(word)
+
+            if len(self.cache) > self.max_size:
+                self.cache.popitem(last=False)
+                self.evictions += 1
+
+    def update(self, stems):
+        """
+        Adds every `word: stem` in `stems` to the cache.
+        """
+        with self.lock:
+            for (word, stem) in stems.items():
+                self.add(word, stem)
+            if self.track_new_stems:
+                self.new_stems.update(stems)
+
+    def pop_new_stems(self):
+        """
+        Returns the stems that were computed by the stemmer since the last
+        call, e.g. to send them from a worker process to its parent.
+        """
+        with self.lock:
+            new_stems = self.new_stems
+            self.new_stems = {}
+            return new_stems
+
+    def get_stats(self):
+        """
+        Returns the hits, misses, evictions, size and hit rate of the cache.
+        """
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self.known_stems) + len(self.cache),
+                'hit_rate': self.hits / lookups if lookups > 0 else 0
+            }
+
+    def save(self, stems_file):
+        """
+        Saves all stems in the cache to `stems_file`, including all new stems
+        that were tracked, even if they were evicted from the LRU entries.
+        """
+        with self.lock:
+            stems = dict(self.known_stems)
+            stems.update(self.new_stems)
+            stems.update(self.cache)
+
+        with open(stems_file, 'wb') as f:
+            pickle.dump(stems, f)
+
+    def load(self, stems_file):
+        """
+        Loads the stems saved in `stems_file` as known stems.
+        """
+        with open(stems_file, 'rb') as f:
+            stems = pickle.load(f)
+
+        with self.lock:
+            self.known_stems.update(stems)
@@ -7,7 +7,7 @@ and postings lists.
 """
 TEMP_DIR = "temp"
 TO_MERGE_DIR = "to_merge"
-MERGED_DIR = "merged"
+DOC_VECTORS_DIR = "doc_vectors"
 DICT_FILE = "dict.txt"
 LISTS_FILE = "lists.txt"
 
@@ -28,8 +28,8 @@ def setup_dirs(out_dict, out_postings):
     if not os.path.isdir(os.path.join(TEMP_DIR, TO_MERGE_DIR)):
         os.mkdir(os.path.join(TEMP_DIR, TO_MERGE_DIR))
 
-    if not os.path.isdir(os.path.join(TEMP_DIR, MERGED_DIR)):
-        os.mkdir(os.path.join(TEMP_DIR, MERGED_DIR))
+    if not os.path.isdir(os.path.join(TEMP_DIR, DOC_VECTORS_DIR)):
+        os.mkdir(os.path.join(TEMP_DIR, DOC_VECTORS_DIR))
     
     if os.path.isfile(out_dict):
         os.remove(out_dict)
@@ -42,15 +42,3 @@ def remove_dirs():
     Removes the temporary directory.
     """
     shutil.rmtree(TEMP_DIR)
-
-def move_from_merged():
-    """
-    Moves all (sub-)directories and files from MERGED_DIR to
-    TO_MERGE_DIR.
-    """
-    main_src_path = os.path.join(TEMP_DIR, MERGED_DIR)
-    main_dest_path = os.path.join(TEMP_DIR, TO_MERGE_DIR)
-    merged_dirs = os.scandir(main_src_path)
-
-    for merged_dir in merged_dirs:
-        shutil.move(str(merged_dir.path), os.path.join(main_dest_path))
@@ -0,0 +1,14 @@
+class TermInfo:
+    """
+    Represents the information of a term that is kept in the dictionary,
+    namely the document frequency, the pointers to its postings list, the
+    upper bound on its score contribution and the size of its bitmap (which
+    is 0 if the term has none).
+    """
+
+    def __init__(self, entry):
+        self.doc_freq = entry.doc_freq
+        self.start_pointer = entry.start_pointer
+        self.end_pointer = entry.end_pointer
+        self.max_score = entry.max_score
+        self.bitmap_size = entry.bitmap_size
@@ -0,0 +1,62 @@
+import unittest
+
+from query_planner import plan_boolean_query
+from search_engine import SearchEngine
+
+class TermEntry:
+    """
+    Represents the dictionary entry of a term, of which the planner only
+    needs the document frequency (see `TermInfo`).
+    """
+
+    def __init__(self, doc_freq):
+        self.doc_freq = doc_freq
+
+class PostingListEngine(SearchEngine):
+    """
+    Represents a search engine whose posting lists are given as lists of
+    `(doc_id, doc_info)`, and which records the clauses whose posting lists
+    were loaded.
+    """
+
+    def __init__(self, posting_lists):
+        self.posting_lists = posting_lists
+        self.loaded_clauses = []
+
+    def merge_posting_lists(self, terms):
+        self.loaded_clauses.append(terms)
+        return self.posting_lists.get(terms[0], [])
+
+class TestQueryPlanner(unittest.TestCase):
+
+    def setUp(self):
+        self.dictionary = {
+            "court": TermEntry(1562),
+            "appeal": TermEntry(300),
+        }
+
+    def test_orders_clauses_by_estimated_size(self):
+        plan = plan_boolean_query([["court"], ["appeal"]], self.dictionary, 2000)
+        self.assertFalse(plan.is_short_circuited())
+        self.assertEqual(plan.get_clauses(), [["appeal"], ["court"]])
+
+    def test_short_circuits_on_missing_term(self):
+        plan = plan_boolean_query([["zzzqqq"], ["court"]], self.dictionary, 2000)
+        self.assertTrue(plan.is_short_circuited())
+        self.assertEqual(plan.empty_clause, ["zzzqqq"])
+        self.assertEqual(plan.get_clauses(), [])
+        self.assertIn("short-circuited", str(plan))
+
+    def test_short_circuits_on_missing_term_after_existing_ones(self):
+        plan = plan_boolean_query([["court"], ["appeal"], ["zzzqqq"]], self.dictionary, 2000)
+        self.assertTrue(plan.is_short_circuited())
+        self.assertEqual(plan.get_clauses(), [])
+
+    def test_missing_term_matches_no_docs(self):
+        engine = PostingListEngine({"court": [(1, None), (2, None)]})
+        self.assertEqual(engine.handle_boolean_query([["court"], ["zzzqqq"], ["appeal"]]), [])
+        # The clauses after the empty one are never loaded
+        self.assertEqual(engine.loaded_clauses, [["court"], ["zzzqqq"]])
+
+if __name__ == "__main__":
+    unittest.main()
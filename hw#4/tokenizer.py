@@ -1,16 +1,59 @@
-from nltk import sent_tokenize, word_tokenize
-from nltk.stem.porter import PorterStemmer
-from nltk.corpus import stopwords
 import re
+import pickle
 import string
 
+from stem_cache import StemCache
+
 # title, content, date_posted, court
 zone_weights = [3, 1, 1, 2]
 
-stops = stopwords.words("english")+[chr(i) for i in range(ord('a'), ord('z')+1)]\
-        + [chr(i) for i in range(ord('A'), ord('Z')+1)]
+# Stopwords, which are loaded on first use (see `get_stopwords`) unless they were
+# loaded from the stopwords file that is saved while indexing (see `load_stopwords`)
+stops = None
+
+# html tags and runs of non-ascii characters, which are removed in a single pass
+html_tag_or_non_ascii = re.compile('<.*?>|[^\x00-\x7F]+')
+
+def create_stemmer():
+    """
+    Returns the stemmer of the words.
+
+    NOTE: nltk is only imported when it is first needed, as importing it
+    takes long. Queries whose words all have known stems never need it.
+    """
+    from nltk.stem.porter import PorterStemmer
+    return PorterStemmer()
 
-stemmer = PorterStemmer()
+# Stems are cached, and the cache is shared by indexing and query tokenization
+stem_cache = StemCache(create_stemmer)
+
+def get_stopwords():
+    """
+    Returns the set of stopwords (including single letters), which is
+    taken from nltk if it has not been loaded yet.
+    """
+    global stops
+    if stops is None:
+        from nltk.corpus import stopwords
+        stops = frozenset(stopwords.words("english")+[chr(i) for i in range(ord('a'), ord('z')+1)]\
+            + [chr(i) for i in range(ord('A'), ord('Z')+1)])
+    return stops
+
+def save_stopwords(stopwords_file):
+    """
+    Saves the set of stopwords to `stopwords_file`, so that query tokenization
+    does not need nltk to load them.
+    """
+    with open(stopwords_file, 'wb') as f:
+        pickle.dump(get_stopwords(), f)
+
+def load_stopwords(stopwords_file):
+    """
+    Loads the set of stopwords saved in `stopwords_file`.
+    """
+    global stops
+    with open(stopwords_file, 'rb') as f:
+        stops = pickle.load(f)
 
 def tokenize_document(content, doc_id):
     """
@@ -72,6 +115,41 @@ def to_token_info_list(token_infos, doc_id):
 
     return token_info_list
 
+def tokenize_biwords(document_token_info, doc_id):
+    """
+    Finds the biwords, i.e. the pairs of adjacent tokens, in the document
+    with `doc_id` from its token information `document_token_info` (see
+    `tokenize_document`).
+
+    Returns a list of `(biword, doc_id, tf, positions)` tuples, where the
+    biword is the two tokens separated by a space (like a phrase), `tf` is
+    the number of times the biword occurs and `positions` are the positions
+    of its first token.
+
+    NOTE: As there is a gap between zones, biwords never span two zones.
+    """
+    token_at = {}
+    for (token, _, _, positions) in document_token_info:
+        for position in positions:
+            token_at[position] = token
+
+    biword_positions = {}
+    for position in sorted(token_at):
+        next_token = token_at.get(position + 1)
+        if next_token is None:
+            continue
+
+        biword = " ".join([token_at[position], next_token])
+        if biword not in biword_positions:
+            biword_positions[biword] = []
+        biword_positions[biword].append(position)
+
+    biword_info_list = []
+    for (biword, positions) in biword_positions.items():
+        biword_info_list.append((biword, doc_id, len(positions), positions))
+
+    return biword_info_list
+
 def tokenize_query(query):
     """
     Tokenizes the given query by splitting it by whitespace
@@ -134,54 +212,55 @@ def tokenize_content(content):
     followed by word tokenization prodvided by nltk library and our 
     own preprocessing heuristics (see `tokenize_word_enhanced`). 
 
-    Returns an array of all tokens by zone such that `tokens_by_zone[i]` is 
-    a list of tokens in the i-th zone.  Moreover, the token in each `tokens_by_zone[i]` is
-    in sequential order. To be specific, `i` = 0, 1, 2 and 3 represent 'title', 'content',
+    Yields the tokens of each zone lazily, such that the i-th item yielded is 
+    a generator of the tokens in the i-th zone.  Moreover, the tokens of each zone are
+    yielded in sequential order. To be specific, `i` = 0, 1, 2 and 3 represent 'title', 'content',
     'date posted' and 'court' respectively.
-    """
-    tokens_by_zone = []   
 
+    NOTE: The zones have to be consumed in order.
+    """
     for text in content:
-        text = remove_non_ascii_characters(text)
-        text = remove_html_tags(text)
-        sentences = sent_tokenize(text)
-        zone_tokens = []
-        for sentence in sentences:
-            words = word_tokenize(sentence)
-            for word in words:
-                token = tokenize_word_enhanced(word)
-                if token is None:
-                    continue
-                zone_tokens.append(token)
-        tokens_by_zone.append(zone_tokens)
-
-    return tokens_by_zone
+        yield tokenize_zone(text)
+
+def tokenize_zone(text):
+    """
+    Yields the tokens of the given zone `text` one at a time.
+    """
+    # Only indexing tokenizes sentences, so nltk is not imported for queries
+    from nltk import sent_tokenize, word_tokenize
+
+    text = normalize_text(text)
+    for sentence in sent_tokenize(text):
+        for word in word_tokenize(sentence):
+            token = tokenize_word_enhanced(word)
+            if token is not None:
+                yield token
 
 def tokenize_word_enhanced(word):
     """
     Tokenize the given word by applying case folding and stemming.
     Returns `None` if the given word is a punctuation
+
+    Stems are looked up in `stem_cache` first.
     """
     word = word.strip(string.punctuation)
 
     # not consider a single letter and stopwords
-    if len(word) == 0 or word in stops:
+    if len(word) == 0 or word in (stops if stops is not None else get_stopwords()):
         return None
-    return stemmer.stem(word.lower())
+    return stem_cache.stem(word.lower())
 
 
-def remove_non_ascii_characters(text):
+def normalize_text(text):
     """
-    Removes non-ascii characters from `text` and returns the result.
+    Removes html tags and non-ascii characters from `text` in a single pass,
+    and returns the result. Html tags are removed, while each run of non-ascii
+    characters is replaced by a space.
     """
-    cleanr = re.compile("([^\x00-\x7F])+")
-    clean_text = re.sub(cleanr, ' ', text)
-    return clean_text
+    return html_tag_or_non_ascii.sub(replace_html_tag_or_non_ascii, text)
 
-def remove_html_tags(raw_html):
+def replace_html_tag_or_non_ascii(match):
     """
-    Removes html tags from `text` and returns the result.
+    Returns the replacement for a match of `html_tag_or_non_ascii`.
     """
-    cleanr = re.compile('<.*?>')
-    clean_text = re.sub(cleanr, '', raw_html)
-    return clean_text
+    return '' if match.group(0)[0] == '<' else ' '
@@ -0,0 +1,185 @@
+from query_util import calculate_weighted_tf, PostingList
+
+try:
+    import numpy as np
+except ImportError:
+    # The vectorized scorer is optional, so numpy is only needed to use it
+    np = None
+
+def is_numpy_available():
+    """
+    Returns True if numpy is installed, i.e. a `VectorScorer` can be used.
+    """
+    return np is not None
+
+def get_weighted_tfs(tfs):
+    """
+    Returns the weighted tfs (see `query_util.calculate_weighted_tf`) of an
+    array of (possibly adjusted) tfs.
+
+    NOTE: The weighted tf of each distinct tf is computed by
+    `calculate_weighted_tf` itself, so that the weights are exactly the ones
+    of the non-vectorized scoring. There are only a few distinct tfs.
+    """
+    (distinct_tfs, indices) = np.unique(tfs, return_inverse=True)
+    weighted_tfs = np.array([calculate_weighted_tf(tf) for tf in distinct_tfs.tolist()], \
+        dtype=np.float64)
+    return weighted_tfs[indices]
+
+def get_doc_weight_arrays(term, posting_list, phrase_weight):
+    """
+    Returns the `(doc_ids, doc_weights)` of a posting list as arrays, where
+    the weight of the term (which can be a phrase) in each doc is the one of
+    `query_util.get_doc_weight`.
+
+    The weights of a term in its own `PostingList` are computed straight
+    from its arrays of docIDs and tfs, whose docIDs are viewed without
+    copying them. Otherwise, the tfs are taken from the doc infos.
+    """
+    if isinstance(posting_list, PostingList) and posting_list.term == term:
+        # The adjusted tf of a single term is its tf (see `calculate_doc_weight`)
+        return (np.frombuffer(posting_list.doc_ids, dtype=np.uint32), \
+            get_weighted_tfs(np.frombuffer(posting_list.tfs, dtype=np.uint32)))
+
+    doc_ids = []
+    doc_infos = []
+    for (doc_id, doc_info) in posting_list:
+        doc_ids.append(doc_id)
+        doc_infos.append(doc_info)
+
+    term_freqs = get_tfs(term, doc_infos)
+    doc_weights = np.zeros(len(doc_infos))
+    for phrase_word in term.split():
+        phrase_word_tfs = get_tfs(phrase_word, doc_infos)
+        adjusted_tfs = term_freqs + (phrase_word_tfs - term_freqs) * (1 - phrase_weight)
+        doc_weights = doc_weights + get_weighted_tfs(adjusted_tfs)
+
+    return (np.array(doc_ids, dtype=np.int64), doc_weights)
+
+def get_tfs(term, doc_infos):
+    """
+    Returns the tfs of the term in the given doc infos as an array, which
+    are 0 for the docs without the term.
+    """
+    return np.array([doc_info.get_tf(term) for doc_info in doc_infos], dtype=np.int64)
+
+class DocArrays:
+    """
+    Represents the docIDs, lengths and court importance of all docs as
+    NumPy arrays, which are indexed by the internal docIDs (see
+    `DocLengths`) and viewed over the arrays of the given lengths without
+    copying them.
+
+    The arrays are only built once per `SearchIndex`, and are shared by the
+    `VectorScorer`s of all its engines.
+
+    NOTE: Requires numpy (see `is_numpy_available`).
+    """
+
+    def __init__(self, lengths):
+        self.doc_ids = np.frombuffer(lengths.doc_ids, dtype=np.uint32)
+        self.doc_lengths = np.frombuffer(lengths.lengths, dtype=np.float64)
+        self.court_importance = np.frombuffer(lengths.court_importance, dtype=np.uint8)
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+class VectorScorer:
+    """
+    Represents the scores of the docs of a query as NumPy arrays, which are
+    indexed by the internal docIDs (see `DocLengths`).
+
+    The contributions of each term are computed for its whole posting list
+    at once, and are added to a dense array of the (unnormalised) cosine
+    similarity scores of all docs. The final scores are computed with array
+    operations as well, and the top k docs are found with `np.argpartition`
+    instead of a heap.
+
+    The scores are exactly the ones of `SearchEngine.compute_cosine_score`:
+    the contributions of each doc are added in the same order, and the docs
+    are kept in the order they were first scored in, which the ranking of
+    tied docs depends on.
+
+    NOTE: Only the scores of the query are held by the scorer, while the
+    arrays of all docs are the shared `DocArrays` of the index.
+
+    NOTE: Requires numpy (see `is_numpy_available`).
+    """
+
+    def __init__(self, doc_arrays, quality_scores, quality_weight):
+        self.doc_arrays = doc_arrays
+        self.doc_ids = doc_arrays.doc_ids
+        # Quality score of each court importance, which is only looked up for the scored docs
+        self.quality_table = np.zeros(max(quality_scores) + 1)
+        for (importance, quality_score) in quality_scores.items():
+            self.quality_table[importance] = quality_score
+        self.quality_weight = quality_weight
+
+        self.reset()
+
+    def reset(self):
+        """
+        Resets the scores of all docs, so that the next query can be scored.
+        """
+        self.scores = np.zeros(len(self.doc_arrays))
+        self.is_scored = np.zeros(len(self.doc_arrays), dtype=bool)
+        # Internal docIDs of the scored docs, in the order they were first scored in
+        self.scored_ids = []
+
+    def get_internal_ids(self, doc_ids):
+        """
+        Returns the internal docIDs of an array of (existing) docIDs.
+        """
+        return np.searchsorted(self.doc_ids, doc_ids)
+
+    def add(self, doc_ids, contributions):
+        """
+        Adds the contributions of a term to the scores of the given docs. A
+        doc may appear more than once, and all its contributions are added
+        in order.
+        """
+        internal_ids = self.get_internal_ids(doc_ids)
+        # Posting lists are sorted by docID, so the new docs come out in order
+        self.scored_ids.append(np.unique(internal_ids[~self.is_scored[internal_ids]]))
+        self.is_scored[internal_ids] = True
+        np.add.at(self.scores, internal_ids, contributions)
+
+    def get_final_scores(self):
+        """
+        Returns the `(internal_ids, scores)` of the scored docs, where each
+        score combines the cosine similarity score with the quality score
+        (see `SearchEngine.compute_final_score`).
+        """
+        internal_ids = np.concatenate(self.scored_ids) if self.scored_ids \
+            else np.zeros(0, dtype=np.int64)
+        quality_scores = self.quality_table[self.doc_arrays.court_importance[internal_ids]]
+        doc_lengths = self.doc_arrays.doc_lengths[internal_ids]
+        scores = self.quality_weight * quality_scores + \
+            (1 - self.quality_weight) * self.scores[internal_ids] / doc_lengths
+        return (internal_ids, scores)
+
+    def get_scores(self):
+        """
+        Returns the final scores of the scored docs, as a dictionary from
+        docID to score.
+        """
+        (internal_ids, scores) = self.get_final_scores()
+        return dict(zip(self.doc_ids[internal_ids].tolist(), scores.tolist()))
+
+    def get_top_k_scores(self, k):
+        """
+        Returns the final scores of the top k docs with positive scores (and
+        of any docs tied with them), as a dictionary from docID to score, in
+        the order of their docIDs.
+        """
+        (internal_ids, scores) = self.get_final_scores()
+        is_positive = scores > 0
+        (internal_ids, scores) = (internal_ids[is_positive], scores[is_positive])
+
+        if len(scores) > k:
+            threshold = scores[np.argpartition(scores, -k)[-k]]
+            is_top_k = scores >= threshold
+            (internal_ids, scores) = (internal_ids[is_top_k], scores[is_top_k])
+
+        order = np.argsort(internal_ids, kind="stable")
+        return dict(zip(self.doc_ids[internal_ids[order]].tolist(), scores[order].tolist()))